@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import json
+import signal
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dispatcher_axiom_ai import AxiomDispatcher
+
+
+class AxiomServer:
+    """
+    Serves an AxiomDispatcher to many clients at once over a local TCP or Unix
+    socket. The protocol is one JSON object per line.
+
+    Requests:
+        {"session": "alice", "input": "Hello", "stream": true}
+        {"session": "alice", "command": "reset"}    # or "end"
+
+    Responses:
+        {"type": "chunk", "text": "..."}             # while streaming
+        {"type": "done", "session": "alice", "response": "..."}
+        {"type": "error", "error": "..."}
+
+    Each session has its own prompt state and short-term log; requests without
+    a session use one private to the connection, kept in memory only. A session
+    is closed once no connection that used it is still open (a named session's
+    log stays on disk and is read back if the session comes back). Turns run on
+    a thread pool so model, resonance and file work for one session never
+    blocks the event loop or the other sessions. Turns within a session run one
+    at a time.
+    """
+
+    def __init__(self, dispatcher, max_workers=8):
+        self.dispatcher = dispatcher
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="axiom-turn")
+        self._session_locks = {}
+        self._session_users = {}  # session id -> open connections that used it
+
+    async def _send(self, writer, message):
+        writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        own_session = f"conn-{uuid.uuid4().hex[:12]}"
+        used = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self._send(writer, {"type": "error", "error": "Request is not valid JSON"})
+                    continue
+                if not isinstance(request, dict):
+                    await self._send(writer, {"type": "error", "error": "Request must be a JSON object"})
+                    continue
+                session_id = str(request.get("session") or own_session)
+                if session_id not in used:
+                    used.add(session_id)
+                    self._session_users[session_id] = self._session_users.get(session_id, 0) + 1
+                lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+                async with lock:
+                    # The connection's own session can't be resumed later, so it isn't written to disk.
+                    await self._handle_request(request, session_id, session_id != own_session, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for session_id in used:
+                self._release_session(session_id)
+            writer.close()
+
+    async def _handle_request(self, request, session_id, persist, writer):
+        loop = asyncio.get_running_loop()
+        command = request.get("command")
+        if command == "reset":
+            session = await loop.run_in_executor(self.executor, self.dispatcher.get_session, session_id, persist)
+            self.dispatcher.reset_session(session)
+            await self._send(writer, {"type": "done", "session": session_id, "response": ""})
+        elif command == "end":
+            self._end_session(session_id)
+            await self._send(writer, {"type": "done", "session": session_id, "response": ""})
+        elif command is not None:
+            await self._send(writer, {"type": "error", "error": f"Unknown command {command}"})
+        elif isinstance(request.get("input"), str):
+            await self._run_turn(session_id, persist, request["input"], bool(request.get("stream", True)), writer)
+        else:
+            await self._send(writer, {"type": "error", "error": "Request needs an 'input' string or a 'command'"})
+
+    async def _run_turn(self, session_id, persist, text, stream, writer):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+
+        def produce():
+            # The whole turn (prompt stages, generation, logging) runs on one
+            # worker thread; chunks are handed back to the event loop as they come.
+            try:
+                session = self.dispatcher.get_session(session_id, persist)
+                user_input, trigger_inner = self.dispatcher.preprocess_input(text)
+                for chunk in self.dispatcher.process_input_stream(user_input, trigger_inner=trigger_inner, session=session):
+                    loop.call_soon_threadsafe(chunks.put_nowait, ("chunk", chunk))
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, ("error", str(e)))
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, (None, None))
+
+        worker = loop.run_in_executor(self.executor, produce)
+        parts = []
+        failed = False
+        while True:
+            kind, chunk = await chunks.get()
+            if kind is None:
+                break
+            if kind == "error":
+                failed = True
+                await self._send(writer, {"type": "error", "error": chunk})
+                continue
+            parts.append(chunk)
+            if stream:
+                await self._send(writer, {"type": "chunk", "text": chunk})
+        await worker
+        if not failed:
+            await self._send(writer, {"type": "done", "session": session_id, "response": "".join(parts)})
+
+    def _release_session(self, session_id):
+        """Drop a closing connection's claim on a session; end it when nobody is left."""
+        users = self._session_users.get(session_id, 0) - 1
+        if users > 0:
+            self._session_users[session_id] = users
+        else:
+            self._session_users.pop(session_id, None)
+            self._end_session(session_id)
+
+    def _end_session(self, session_id):
+        self._session_locks.pop(session_id, None)
+        self.dispatcher.end_session(session_id)
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+            print(f"[AxiomServer] Listening on {unix_path}")
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            print(f"[AxiomServer] Listening on {host}:{port}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        async with server:
+            await stop.wait()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.dispatcher.save_on_exit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Axiom AI to concurrent sessions over a local socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", dest="unix_path", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=8, help="threads running turns")
+    args = parser.parse_args()
+
+    server = AxiomServer(AxiomDispatcher(), max_workers=args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
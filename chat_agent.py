@@ -1,16 +1,142 @@
-from llama_cpp import Llama
+import os
+import queue
+import hashlib
+import threading
 from collections import deque
+import numpy as np
+from model_registry import acquire_model, PRIORITY_CHAT
+
+_STREAM_END = object()
 
 class ChatAgent:
-    def __init__(self, model_path, max_history=20, max_tokens=2048):
-        self.model = Llama(model_path=model_path, n_ctx=max_tokens, n_threads=8)
+    def __init__(self, model_path, max_history=20, max_tokens=2048, prefix_cache_dir=None, reply_tokens=150):
+        self.model = acquire_model(model_path, n_ctx=max_tokens, n_threads=8)
+        self.model_path = model_path
         self.max_tokens = max_tokens
+        self.reply_tokens = reply_tokens
+        # Evaluated state of a fixed prompt prefix (the seed), reused instead of re-evaluated
+        self.prefix = None
+        self.prefix_cache_dir = prefix_cache_dir
+        self._prefix_tokens = None
+        self._prefix_state = None
+
+    def close(self):
+        self.model.release()
+
+    def warm_up(self):
+        """Load the model and evaluate the prefix, so the first turn pays for neither."""
+        with self.model.locked() as llm:
+            if self.prefix:
+                self._restore_prefix(llm)
+
+    def set_prefix(self, prefix):
+        """
+        Declare the text that session-opening prompts start with. The model
+        state after evaluating it is kept (and, with prefix_cache_dir, saved
+        to disk) so later sessions only evaluate what follows it.
+        """
+        if prefix != self.prefix:
+            self.prefix = prefix
+            self._prefix_tokens = None
+            self._prefix_state = None
+
+    def tokenize(self, text):
+        with self.model.locked() as llm:
+            return llm.tokenize(text.encode("utf-8"), add_bos=False)
+
+    def detokenize(self, tokens):
+        with self.model.locked() as llm:
+            return llm.detokenize(tokens).decode("utf-8", errors="ignore")
+
+    def _prefix_cache_path(self):
+        # Model identity is path + size + context length; a changed seed or model gets a new file.
+        model_path = os.path.abspath(self.model_path)
+        model_size = os.path.getsize(model_path) if os.path.exists(model_path) else 0
+        digest = hashlib.sha256()
+        digest.update(f"{model_path}|{model_size}|{self.max_tokens}\n".encode("utf-8"))
+        digest.update(self.prefix.encode("utf-8"))
+        return os.path.join(self.prefix_cache_dir, f"prefix_{digest.hexdigest()[:16]}.npz")
+
+    def _load_prefix_state(self):
+        if not self.prefix_cache_dir:
+            return None
+        path = self._prefix_cache_path()
+        if not os.path.exists(path):
+            return None
+        try:
+            from llama_cpp import LlamaState  # deferred like the Llama import in model_registry
+            # Plain arrays only (no pickle), so a planted cache file cannot run code.
+            with np.load(path, allow_pickle=False) as data:
+                llama_state = data["llama_state"].tobytes()
+                return LlamaState(
+                    input_ids=data["input_ids"],
+                    scores=data["scores"],
+                    n_tokens=int(data["n_tokens"]),
+                    llama_state=llama_state,
+                    llama_state_size=len(llama_state),
+                )
+        except Exception as e:
+            print(f"[ChatAgent] Ignoring unreadable prefix cache {path}: {e}")
+            return None
+
+    def _save_prefix_state(self, state):
+        if not self.prefix_cache_dir:
+            return
+        os.makedirs(self.prefix_cache_dir, exist_ok=True)
+        path = self._prefix_cache_path()
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    input_ids=state.input_ids,
+                    scores=state.scores,
+                    n_tokens=state.n_tokens,
+                    llama_state=np.frombuffer(state.llama_state, dtype=np.uint8),
+                )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[ChatAgent] Could not save prefix cache {path}: {e}")
+
+    def _restore_prefix(self, llm):
+        """
+        Make the model's evaluated tokens start with the prefix: leave them if
+        they already do, otherwise load the saved state, evaluating the prefix
+        only if there is none yet. Caller holds the model lock. llama.cpp then
+        reuses the matching tokens and only evaluates the rest of the prompt.
+        """
+        if self._prefix_tokens is None:
+            self._prefix_tokens = llm.tokenize(self.prefix.encode("utf-8"))
+        tokens = self._prefix_tokens
+        n = len(tokens)
+        if llm.n_tokens >= n and list(llm.input_ids[:n]) == tokens:
+            return
+        if self._prefix_state is None:
+            self._prefix_state = self._load_prefix_state()
+        if self._prefix_state is not None:
+            try:
+                llm.load_state(self._prefix_state)
+                return
+            except Exception as e:
+                print(f"[ChatAgent] Prefix state did not load, re-evaluating: {e}")
+                self._prefix_state = None
+        llm.reset()
+        llm.eval(tokens)
+        self._prefix_state = llm.save_state()
+        self._save_prefix_state(self._prefix_state)
+
+    def _prepare(self, llm, prompt):
+        if self.prefix and prompt.startswith(self.prefix):
+            self._restore_prefix(llm)
 
     def chat(self, combined_prompt):
-        # Optionally truncate combined_prompt if too long (based on token or word count)
-        # You can add truncation here if needed
-        
-        output = self.model(combined_prompt, max_tokens=150)
+        # The prompt is expected to fit n_ctx - reply_tokens; AxiomDispatcher
+        # assembles it with a PromptBuilder budgeted for that.
+        def generate(llm):
+            self._prepare(llm, combined_prompt)
+            return llm(combined_prompt, max_tokens=self.reply_tokens)
+
+        output = self.model.run(generate, priority=PRIORITY_CHAT)
         response = output['choices'][0]['text'].strip()
 
         # Extract the latest user input from combined_prompt to add to memory
@@ -22,4 +148,34 @@ class ChatAgent:
                 last_user_line = line[len("User:"):].strip()
                 break
 
-        return response
\ No newline at end of file
+        return response
+
+    def chat_stream(self, combined_prompt, max_tokens=None):
+        """
+        Yield the response text piece by piece as llama.cpp generates it.
+        Generation runs on the model's inference queue; closing the generator
+        early stops it at the next token.
+        """
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def generate(llm):
+            self._prepare(llm, combined_prompt)
+            for part in llm(combined_prompt, max_tokens=max_tokens or self.reply_tokens, stream=True):
+                if stop.is_set():
+                    break
+                text = part['choices'][0]['text']
+                if text:
+                    chunks.put(text)
+
+        future = self.model.submit(generate, priority=PRIORITY_CHAT)
+        future.add_done_callback(lambda _: chunks.put(_STREAM_END))
+        try:
+            while True:
+                text = chunks.get()
+                if text is _STREAM_END:
+                    break
+                yield text
+            future.result()  # re-raise a generation error
+        finally:
+            stop.set()
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import json
+from jsonl_writer import JsonlWriter, parse_records
+
+
+class ConversationLog:
+    """
+    Append-only JSONL log of dialogue records. Appends go through a
+    JsonlWriter, which fsyncs in batches, so a turn costs one short write
+    however long the conversation is. Startup reads only the last records,
+    seeking back from the end of the file. A legacy JSON list file is
+    converted on first use and kept as `<legacy_path>.migrated`.
+    """
+
+    def __init__(self, path, legacy_path=None, fsync_every=32, fsync_interval=1.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        if legacy_path and os.path.exists(legacy_path) and not os.path.exists(path):
+            self._migrate(legacy_path)
+        self._writer = JsonlWriter(path, fsync_every, fsync_interval)
+
+    def _migrate(self, legacy_path):
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ConversationLog] Could not read {legacy_path}, starting a new log: {e}")
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        print(f"[ConversationLog] Migrated {len(records)} records from {legacy_path} to {self.path}")
+
+    def append(self, record):
+        self._writer.append(json.dumps(record, ensure_ascii=False))
+
+    def sync(self):
+        self._writer.sync()
+
+    def sync_if_due(self):
+        """Fsync pending records once they are older than fsync_interval."""
+        self._writer.sync_if_due()
+
+    def tail(self, n, block_size=8192):
+        """Return the last n records, reading backwards from the end of the file."""
+        if n <= 0:
+            return []
+        self._writer.flush()
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            data = b""
+            while pos > 0 and data.count(b"\n") <= n:
+                step = min(block_size, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+        lines = data.split(b"\n")
+        if pos > 0:
+            lines = lines[1:]  # starts mid-record
+        return parse_records(lines, self.path, "ConversationLog")[-n:]
+
+    def close(self):
+        self._writer.close()
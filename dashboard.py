@@ -101,7 +101,7 @@ class AxiomDashboard(tk.Tk):
             resonance_score=result["score"],
             sacred_moment=result["sacred_moment"]
         )
-        cosmic = self.resonant_agent.get_cosmic_factors()
+        cosmic = result["factors"]
         state_vec = self.resonant_agent.get_state_vector()
         emotion_vec = self.emotion_agent.emotion_vector()
 
@@ -1,6 +1,11 @@
 import json
 import os
+import re
+import hashlib
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from memory_agent import MemoryAgent
 from chat_agent import ChatAgent  # import your new chat agent class
@@ -8,6 +13,10 @@ from thinking import InnerMonologueAgent  # New: separate summarizer and monolog
 from perception_interface import PerceptionInterface
 from emotion_agent import EmotionAgent
 from resonant_ai import ResonantAgent
+from model_registry import warm_up_in_background
+from prompt_builder import PromptBuilder, PromptSection
+from conversation_log import ConversationLog
+from scheduler import get_scheduler
 import atexit
 import signal
 import sys
@@ -15,28 +24,137 @@ import sys
 
 TRIGGER_CHAR = "\uE000"
 
+
+def rewrite_stream(chunks, old="Assistant:", new="Axiom AI:"):
+    """
+    Streaming equivalent of `text.replace(old, new).strip()`. Text is passed
+    on as soon as no later chunk can change it; only a tail that could still
+    be the start of `old`, and trailing whitespace, is held back.
+    """
+    pending = ""
+    started = False
+    for chunk in chunks:
+        pending += chunk
+        if not started:
+            pending = pending.lstrip()
+            if not pending:
+                continue
+            started = True
+        pending = pending.replace(old, new)
+        hold = 0
+        for n in range(min(len(old) - 1, len(pending)), 0, -1):
+            if old.startswith(pending[-n:]):
+                hold = n
+                break
+        ready = pending[:len(pending) - hold].rstrip()
+        if ready:
+            yield ready
+            pending = pending[len(ready):]
+    pending = pending.replace(old, new).rstrip()
+    if pending:
+        yield pending
+
+class DialogueSession:
+    """
+    Prompt state and short-term log of one conversation. The CLI uses a single
+    default session; the server keeps one per connected client. A session
+    without a conversation_log lives only in memory.
+    """
+
+    def __init__(self, session_id, conversation_log=None, history_limit=50):
+        self.session_id = session_id
+        self.conversation_log = conversation_log
+        self.initial_prompt_sent = False
+        # Only the recent end of the conversation is kept in memory.
+        history = conversation_log.tail(history_limit) if conversation_log is not None else []
+        self.memory_log = deque(history, maxlen=history_limit)
+        self._fsync_job = None
+        if conversation_log is not None:
+            self._fsync_job = get_scheduler().schedule(
+                conversation_log.sync_if_due, interval=conversation_log.fsync_interval,
+                name=f"conversation log fsync ({session_id})", on_shutdown=conversation_log.sync
+            )
+
+    def log_message(self, role, content, persist=True):
+        """Add a message to the short-term log; with persist=False the caller writes it to disk later."""
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "role": role,
+            "content": content
+        }
+        self.memory_log.append(record)
+        if persist:
+            self.persist(record)
+        return record
+
+    def persist(self, record):
+        if self.conversation_log is not None:
+            self.conversation_log.append(record)
+
+    def sync(self):
+        if self.conversation_log is not None:
+            self.conversation_log.sync()
+
+    def reset(self):
+        self.initial_prompt_sent = False
+        self.memory_log.clear()
+
+    def close(self):
+        if self._fsync_job is not None:
+            self._fsync_job.cancel()
+            self.conversation_log.close()
+
+
 class AxiomDispatcher:
     def __init__(
         self,
         seed_path="axiom_seed.json",
         monologue_seed_path="monologue_seed.json",
-        memory_path="axiom_memory.json",
+        memory_path="axiom_memory.jsonl",
+        legacy_memory_path="axiom_memory.json",
+        history_limit=50,
         max_inner_cycles=5,
-        inner_cycle_timeout=15
+        inner_cycle_timeout=15,
+        warm_up=True,
+        prefix_cache_dir=None,
+        session_dir="sessions"
     ):
         self.seed_prompt = self.load_seed_as_prompt(seed_path)
         #self.monologue_seed_prompt = self.load_seed_as_prompt(monologue_seed_path)
         self.max_tokens = 2048
         self.memory_path = memory_path
-        self.memory_log = self.load_memory()
+        self.history_limit = history_limit
+        # The default session (CLI) keeps the original log file; server sessions get one each.
+        self.session = DialogueSession(
+            "default", ConversationLog(memory_path, legacy_path=legacy_memory_path), history_limit
+        )
+        self.session_dir = session_dir
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
         self.memory_agent = MemoryAgent()
+        self._snippet_cache = (None, [])  # (ids of the batch logs, formatted snippets)
+        # Resonance and emotion state are shared by all sessions; guard their update.
+        self._state_lock = threading.Lock()
+        # Prompt stages that don't depend on each other run side by side, and
+        # persistence runs in order on one writer thread, off the response path.
+        self._stage_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="axiom-stage")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="axiom-writer")
         self.resonant_agent = ResonantAgent()
-        self.emotion_agent = EmotionAgent(memory_agent=self.memory_agent)
+        # Keep cosmic factors warm off the chat path so run_cycle never waits on HTTP.
+        self.resonant_agent.start_background_refresh()
+        self.emotion_agent = EmotionAgent(memory_agent=self.memory_agent, writer=self._writer)
 
         # Use raw string for Windows path or replace \ with /
         self.chat_agent = ChatAgent(
             model_path=r"models\openhermes\openhermes-2.5-mistral-7b.Q4_K_S.gguf",
-            max_tokens=self.max_tokens
+            max_tokens=self.max_tokens,
+            prefix_cache_dir=prefix_cache_dir
+        )
+        # Every session opens with the seed; its evaluated state is reused across sessions.
+        self.chat_agent.set_prefix(self.seed_prompt)
+        # Prompts must leave room in the context for the reply.
+        self.prompt_builder = PromptBuilder(
+            self.chat_agent, max_tokens=self.max_tokens - self.chat_agent.reply_tokens
         )
 
 
@@ -44,12 +162,75 @@ class AxiomDispatcher:
             model_path=r"models\tinyllama\tinyllama-1.1b-chat-v0.4.q2_k.gguf"
         )
 
+        # Models load on first use; optionally start loading the chat model and
+        # evaluating the seed now, off the main thread, so the prompt appears immediately.
+        if warm_up:
+            warm_up_in_background(self.chat_agent)
+
         self.inner_monologue_active = False
         self.inner_monologue_seed_sent = False
         self.max_inner_cycles = max_inner_cycles
         self.inner_cycle_timeout = inner_cycle_timeout
         self.perception = PerceptionInterface()
-        self.initial_prompt_sent = False
+
+    # The default session's state, as attributes for existing callers.
+    @property
+    def conversation_log(self):
+        return self.session.conversation_log
+
+    @property
+    def memory_log(self):
+        return self.session.memory_log
+
+    @property
+    def initial_prompt_sent(self):
+        return self.session.initial_prompt_sent
+
+    @initial_prompt_sent.setter
+    def initial_prompt_sent(self, value):
+        self.session.initial_prompt_sent = value
+
+    def get_session(self, session_id=None, persist=True):
+        """
+        Return the session with this id, creating it on first use. A persistent
+        session logs to its own file under session_dir; the name mixes a readable
+        part of the id with a hash of the whole id, so distinct ids never share a file.
+        """
+        if session_id is None:
+            return self.session
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                log = None
+                if persist:
+                    os.makedirs(self.session_dir, exist_ok=True)
+                    readable = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)[:32]
+                    digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+                    log = ConversationLog(os.path.join(self.session_dir, f"{readable}-{digest}.jsonl"))
+                session = DialogueSession(session_id, log, self.history_limit)
+                self.sessions[session_id] = session
+            return session
+
+    def end_session(self, session_id):
+        with self._sessions_lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self._submit_write(session.close)  # after its queued writes
+
+    def _submit_write(self, fn, *args, **kwargs):
+        try:
+            return self._writer.submit(fn, *args, **kwargs)
+        except RuntimeError:
+            # Writer already shut down (exiting); write inline.
+            return fn(*args, **kwargs)
+
+    def wait_for_writes(self):
+        """Block until everything queued on the background writer has been written."""
+        try:
+            self._writer.submit(lambda: None).result()
+        except RuntimeError:
+            pass  # shut down, so nothing is left queued
+
     def load_seed_as_prompt(self, seed_path):
         try:
             with open(seed_path, "r") as f:
@@ -73,26 +254,46 @@ class AxiomDispatcher:
         return prompt
 
     def load_memory(self):
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r") as f:
-                return json.load(f)
-        return []
+        # Only the recent end of the conversation is kept in memory.
+        return deque(self.conversation_log.tail(self.history_limit), maxlen=self.history_limit)
 
     def save_memory(self):
-        with open(self.memory_path, "w") as f:
-            json.dump(self.memory_log, f, indent=2)
+        """Make every logged message durable now rather than at the next periodic fsync."""
+        self.conversation_log.sync()
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.sync()
+
+    def log_message(self, role, content, session=None):
+        """Add a message to the session's log; the disk write queues behind the turn's own writes."""
+        session = session or self.session
+        record = session.log_message(role, content, persist=False)
+        self._submit_write(session.persist, record)
 
     def fetch_recent_personality_snippets(self, limit=5, time_window=3600):
-        memories = self.memory_agent.get_memories(data_type="text_file", time_window=time_window)
-        snippets = []
-        for mem in sorted(memories, key=lambda m: m.timestamp, reverse=True)[:limit]:
-            try:
-                with open(os.path.join(self.memory_agent.storage_dir, mem.data), "r", encoding="utf-8") as f:
-                    content = f.read()
+        return "\n".join(self.recent_personality_snippets(limit, time_window))
+
+    def recent_personality_snippets(self, limit=5, time_window=3600):
+        """
+        Contents of the most recent batch logs, oldest first. The formatted
+        snippets are only rebuilt when the set of files changes, and file
+        contents come from MemoryAgent's cache.
+        """
+        memories = self.memory_agent.recent_text_files(limit=limit, time_window=time_window)
+        key = tuple(mem.id for mem in memories)
+        cached_key, snippets = self._snippet_cache
+        if key != cached_key:
+            snippets = []
+            for mem in memories:
+                try:
+                    content = self.memory_agent.read_text_file(mem.data)
                     snippets.append(f"[{datetime.fromtimestamp(mem.timestamp)}] {content.strip()}")
-            except Exception:
-                continue
-        return "\n".join(snippets)
+                except Exception:
+                    continue
+            snippets.reverse()
+            self._snippet_cache = (key, snippets)
+        return list(snippets)
     
     def process_inner_task(self, prompt, mode='monologue'):
         if mode == 'monologue':
@@ -127,43 +328,87 @@ class AxiomDispatcher:
 
         return tags  # you should return tags here
 
-    def process_input(self, user_input: str, trigger_inner=False) -> str:
-
-        # Run resonance cycle
-        resonant_result = self.resonant_agent.run_cycle()
-        resonance_score = resonant_result.get("score", 0)
-        sacred_moment = resonant_result.get("sacred_moment", False)
-
-        # Update emotion agent
-        current_emotion = self.emotion_agent.update_from_resonance(resonance_score, sacred_moment)
-        emotion_vector = self.emotion_agent.emotion_vector()
+    def build_prompt(self, user_input, session=None):
+        """Run the resonance/emotion step and build this turn's prompt. Returns (prompt, turn metadata)."""
+        session = session or self.session
+        # Resonance -> emotion runs alongside gathering the memory context.
+        mood = self._stage_pool.submit(self._update_mood)
+        first_turn = not session.initial_prompt_sent
+        if first_turn:
+            memory_snippets = [
+                f"[{m['timestamp']}] {m['role'].capitalize()}: {m['content']}" for m in list(session.memory_log)[-5:]
+            ]
+            personality_snippets = self.recent_personality_snippets()
+        resonance_score, sacred_moment, current_emotion, emotion_vector = mood.result()
 
         # Build emotion context string
         emotion_context = f"Emotional state: {current_emotion}. Emotion levels: {emotion_vector}"
 
-        # Fetch recent memory snippets (last 5 messages)
-        memory_snippets = "\n".join(
-            [f"[{m['timestamp']}] {m['role'].capitalize()}: {m['content']}" for m in self.memory_log[-5:]]
-        )
-
-        # Fetch recent personality snippets (long-term memory)
-        personality_snippets = self.fetch_recent_personality_snippets()
-
-        if not self.initial_prompt_sent:
-            # Send full seed + memory + user input for first prompt
-            combined_prompt = (
-                self.seed_prompt
-                + "\n\nSHORT-TERM MEMORY:\n" + memory_snippets
-                + "\n\nLONG-TERM MEMORY SNIPPETS:\n" + personality_snippets
-                + "\n\nUser: " + user_input
-            )
-            self.initial_prompt_sent = True
+        # Sections are trimmed to fit the context window, lowest priority first:
+        # long-term snippets, then short-term memory, then emotion context. The
+        # user's text has no budget of its own; it is cut only if the prompt
+        # still doesn't fit once everything below it is gone.
+        if first_turn:
+            # Send full seed + emotion + memory + user input for first prompt.
+            # The seed goes first so its cached model state can be reused.
+            sections = [
+                PromptSection("seed", self.seed_prompt, priority=5, required=True),
+                PromptSection("emotion", emotion_context, priority=3, budget=128),
+                PromptSection("short_term", memory_snippets, priority=2, budget=384, header="SHORT-TERM MEMORY:\n"),
+                PromptSection("long_term", personality_snippets, priority=1, budget=512,
+                              header="LONG-TERM MEMORY SNIPPETS:\n"),
+                PromptSection("user", user_input, priority=4, header="User: "),
+            ]
+            session.initial_prompt_sent = True
         else:
             # For subsequent prompts, just send emotion + user input
-            combined_prompt = "User: " + user_input
+            sections = [
+                PromptSection("emotion", emotion_context, priority=3, budget=128),
+                PromptSection("user", user_input, priority=4, header="User: "),
+            ]
+        full_prompt, usage = self.prompt_builder.build(sections)
+        if sections[-1].items != [user_input]:
+            print(f"[AxiomDispatcher] User input too long for the context window; kept its last {usage['user']} tokens")
+        turn = {"emotion": current_emotion, "resonance_score": resonance_score, "sacred_moment": sacred_moment}
+        return full_prompt, turn
+
+    def _update_mood(self):
+        with self._state_lock:
+            # Run resonance cycle
+            resonant_result = self.resonant_agent.run_cycle()
+            resonance_score = resonant_result.get("score", 0)
+            sacred_moment = resonant_result.get("sacred_moment", False)
+
+            # Update emotion agent
+            current_emotion = self.emotion_agent.update_from_resonance(resonance_score, sacred_moment)
+            emotion_vector = self.emotion_agent.emotion_vector()
+        return resonance_score, sacred_moment, current_emotion, emotion_vector
+
+    def record_turn(self, user_input, response, turn, session=None):
+        """
+        Store a finished exchange. The short-term log is updated right away for
+        the next prompt; disk writes and memory tagging go to the background writer.
+        """
+        session = session or self.session
+        records = [
+            session.log_message("user", user_input, persist=False),
+            session.log_message("assistant", response, persist=False),
+        ]
+        self._submit_write(self._persist_turn, session, records, user_input, response, turn)
+
+    def _persist_turn(self, session, records, user_input, response, turn):
+        for record in records:
+            session.persist(record)
+
+        # Store chat + emotional metadata
+        self.memory_agent.store_tagged_memory(
+            tag="chat",
+            data={"user_input": user_input, "ai_response": response},
+            metadata=turn
+        )
 
-        # Combine emotion context and combined prompt for final input
-        full_prompt = emotion_context + "\n\n" + combined_prompt
+    def process_input(self, user_input: str, trigger_inner=False, session=None) -> str:
+        full_prompt, turn = self.build_prompt(user_input, session)
 
         # Generate response depending on trigger
         try:
@@ -177,56 +422,74 @@ class AxiomDispatcher:
             return f"Error generating response: {e}"
 
         # Store full interaction in memory
-        self.memory_log.append({
-            "timestamp": datetime.now().isoformat(),
-            "role": "user",
-            "content": user_input
-        })
-        self.memory_log.append({
-            "timestamp": datetime.now().isoformat(),
-            "role": "assistant",
-            "content": response
-        })
-        self.save_memory()
-
-            # Store chat + emotional metadata
-        self.memory_agent.store_tagged_memory(
-            tag="chat",
-            data={"user_input": user_input, "ai_response": response},
-            metadata={"emotion": current_emotion, "resonance_score": resonance_score, "sacred_moment": sacred_moment}
-        )
+        self.record_turn(user_input, response, turn, session)
 
             # If monologue triggered, run it now
         if trigger_inner:
             self.inner_monologue_active = True
             inner_response = self.run_inner_monologue(response, mode='monologue')
             self.inner_monologue_active = False
-            self.memory_log.append({
-                "timestamp": datetime.now().isoformat(),
-                "role": "inner_monologue",
-                "content": inner_response
-            })
-            self.save_memory()
+            self.log_message("inner_monologue", inner_response, session)
             return f"{response}\n\n[Inner Monologue]\n{inner_response}"
 
         return response
 
+    def process_input_stream(self, user_input: str, trigger_inner=False, session=None):
+        """
+        Like process_input, but yields the response as the model generates it,
+        so the first words show up after one token rather than the whole reply.
+        The prompt is built before this returns; the exchange is stored once
+        the stream is exhausted.
+        """
+        if trigger_inner:
+            # The inner monologue path doesn't stream; hand it back in one piece.
+            return iter([self.process_input(user_input, trigger_inner=True, session=session)])
+
+        full_prompt, turn = self.build_prompt(user_input, session)
+        return self._stream_response(user_input, full_prompt, turn, session)
+
+    def _stream_response(self, user_input, full_prompt, turn, session):
+        parts = []
+        try:
+            for text in rewrite_stream(self.chat_agent.chat_stream(full_prompt)):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            prefix = "\n" if parts else ""
+            yield f"{prefix}Error generating response: {e}"
+            return
+        self.record_turn(user_input, "".join(parts), turn, session)
 
     def save_on_exit(self):
         print("Saving memories before exit...")
         try:
+            self._writer.shutdown(wait=True)  # Finish queued log and memory writes
+            self.memory_agent.wait_for_summaries(timeout=30)  # Let a queued decay summary land
+            self.memory_agent.flush()  # Flush any pending text logs
             self.memory_agent.save_index()  # Save memory index JSON
-            self.memory_agent._flush_text_log_batch()  # Flush any pending text logs
             self.memory_agent.save_dialogue_memory()  # If you use this for dialogue memory
+            self.save_memory()  # Fsync the conversation log
+            get_scheduler().shutdown()  # Final run of every agent's periodic flush
         except Exception as e:
             print(f"Error during save_on_exit: {e}")
-    def reset_session(self):
-        self.initial_prompt_sent = False
-        self.memory_log.clear()  # optional: clear short-term memory if needed
+    def reset_session(self, session=None):
+        (session or self.session).reset()  # clears short-term memory too
         # Any other reset logic here
 
+def install_exit_handlers(dispatcher):
+    """Save memories on Ctrl+C, SIGTERM or normal interpreter exit."""
+    def signal_handler(sig, frame):
+        dispatcher.save_on_exit()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    atexit.register(dispatcher.save_on_exit)
+
+
 if __name__ == "__main__":
     dispatcher = AxiomDispatcher()
+    install_exit_handlers(dispatcher)
 
     print("Axiom AI Dispatcher with Local ChatAgent Ready.")
     print("Type 'exit' or 'quit' to stop. Inner monologue is only available thru programming.\n")
@@ -237,17 +500,8 @@ if __name__ == "__main__":
             break
 
         user_input, trigger_inner = dispatcher.preprocess_input(user_input)
-        dialogue_response = dispatcher.process_input(user_input, trigger_inner=trigger_inner)
-        print("Axiom AI:", dialogue_response)
-        
-
-
-
-def signal_handler(sig, frame):
-    dispatcher.save_on_exit()
-    sys.exit(0)
-
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-
-atexit.register(dispatcher.save_on_exit)
+        stream = dispatcher.process_input_stream(user_input, trigger_inner=trigger_inner)
+        print("Axiom AI: ", end="", flush=True)
+        for text in stream:
+            print(text, end="", flush=True)
+        print()
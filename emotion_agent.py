@@ -58,9 +58,10 @@ class EmotionState:
 
 
 class EmotionAgent:
-    def __init__(self, memory_agent=None):
+    def __init__(self, memory_agent=None, writer=None):
         self.state = EmotionState()
         self.memory_agent = memory_agent or MemoryAgent()
+        self.writer = writer  # optional executor that stores emotion memories off the caller's thread
 
     def update_from_resonance(self, resonance_score, sacred_moment=False):
         emotion_vector = {k: float(v) for k, v in self.state.collapse_state(resonance_score, sacred_moment).items()}
@@ -72,7 +73,7 @@ class EmotionAgent:
             "resonance_score": resonance_score,
             "sacred": sacred_moment
         }
-        self.memory_agent.store_tagged_memory(
+        self._store(
             tag="emotion",
             data=emotion_vector,
             data_type="emotion_vector",
@@ -97,6 +98,15 @@ class EmotionAgent:
 
         return emotion
 
+    def _store(self, **memory):
+        if self.writer is not None:
+            try:
+                self.writer.submit(self.memory_agent.store_tagged_memory, **memory)
+                return
+            except RuntimeError:
+                pass  # writer already shut down (exiting); store inline
+        self.memory_agent.store_tagged_memory(**memory)
+
     def current_emotion(self):
         return self.state.last_state or "neutral"
 
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import threading
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL file shared by MemoryJournal and ConversationLog. Lines
+    go to a buffered file and are fsynced in batches (every `fsync_every`
+    lines or `fsync_interval` seconds, whichever comes first), so an append
+    costs one short write. A file left ending mid-line by a crash gets a
+    newline on open, so the next record is not glued onto the torn one.
+    """
+
+    def __init__(self, path, fsync_every=64, fsync_interval=1.0, before_sync=None):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.before_sync = before_sync  # e.g. make sidecar files durable before the records that point at them
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sync = time.time()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._ends_mid_record():
+            self._file.write("\n")
+
+    def _ends_mid_record(self):
+        with open(self.path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def append(self, line):
+        with self._lock:
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= self.fsync_every or (time.time() - self._last_sync) >= self.fsync_interval:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        if self.before_sync is not None:
+            self.before_sync()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def sync(self):
+        with self._lock:
+            if self._pending and not self._file.closed:
+                self._sync_locked()
+
+    def sync_if_due(self):
+        """Fsync pending lines once they are older than fsync_interval."""
+        with self._lock:
+            if self._pending and not self._file.closed and (time.time() - self._last_sync) >= self.fsync_interval:
+                self._sync_locked()
+
+    def flush(self):
+        """Hand buffered lines to the OS so readers of the file see them."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def truncate(self, before=None):
+        """Empty the file. `before` runs first under the same lock, e.g. to swap in a snapshot covering it."""
+        with self._lock:
+            if before is not None:
+                before()
+            self._file.close()
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._pending = 0
+            self._last_sync = time.time()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync_locked()
+                self._file.close()
+
+
+def parse_records(lines, path, tag):
+    """Decode JSONL lines, skipping blank ones and any that do not parse."""
+    records = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # A torn final write from a crash; everything before it is intact.
+            print(f"[{tag}] Skipping unreadable record in {path}")
+    return records
@@ -1,38 +1,68 @@
 import os
 import time
 import json
-from collections import deque
+from collections import deque, OrderedDict
+from itertools import islice, compress
 import numpy as np
 import uuid
 import threading
 from datetime import datetime
-from thinking import TinyLlamaSummarizer
+from thinking import TinyLlamaSummarizer, SummarizationWorker
+from memory_journal import MemoryJournal
+from vector_store import VectorStore
+from vector_index import VectorIndex
+from scheduler import get_scheduler
 
 class MemoryItem:
     def __init__(self, data, data_type, timestamp=None, weight=1.0, metadata=None, id=None):
         self.data = data
         self.data_type = data_type
         self.timestamp = timestamp or time.time()
-        self.weight = weight
+        # While an item sits in a MemoryAgent its live weight is kept in the
+        # agent's weight column; _owner/_seq locate that row.
+        self._owner = None
+        self._seq = None
+        self._weight = weight
+        self._vector_ref = None  # location of an ndarray payload in the agent's VectorStore
+        self._decay_origin = None  # when a reloaded weight was recorded, so lazy decay resumes from there
         self.metadata = metadata or {}
         self.id = id or str(uuid.uuid4())
 
-    def to_dict(self):
+    @property
+    def weight(self):
+        owner = self._owner  # another thread may evict the item at any moment
+        if owner is not None:
+            return owner._read_weight(self)
+        return self._weight
+
+    @weight.setter
+    def weight(self, value):
+        self._weight = value
+        owner = self._owner
+        if owner is not None:
+            owner._write_weight(self, value)
+
+    def to_dict(self, weight=None, now=None):
+        """`weight`/`now` let a caller that already read the weight column skip the per-item lookup."""
         serializable_data = self.data
         if isinstance(self.data, np.ndarray):
             serializable_data = None
-        return {
+        d = {
             "id": self.id,
             "data": serializable_data,
             "data_type": self.data_type,
             "timestamp": self.timestamp,
-            "weight": self.weight,
-            "metadata": self.metadata,
+            "weight": self.weight if weight is None else weight,
+            "weight_at": now or time.time(),
+            "metadata": dict(self.metadata),  # a copy, so it can be written out after the lock is released
         }
+        if self._vector_ref is not None:
+            d["vector"] = self._vector_ref
+        return d
 
     @classmethod
     def from_dict(cls, d):
-        return cls(
+        item = cls(
             data=d.get("data"),
             data_type=d.get("data_type"),
             timestamp=d.get("timestamp"),
@@ -40,25 +70,156 @@ class MemoryItem:
             metadata=d.get("metadata", {}),
             id=d.get("id")
         )
+        # Older files have no weight_at; the weight was at most as fresh as the item.
+        item._decay_origin = d.get("weight_at", item.timestamp)
+        return item
+
+class _ColumnBuffer:
+    """
+    Growable NumPy columns kept parallel to memory_bank: row `start + i` holds
+    the values for memory_bank[i]. Evicting from the left only advances `start`;
+    the dead prefix is reclaimed the next time the buffer fills up, so append
+    and evict are amortised O(1).
+    """
+
+    def __init__(self, dtypes, initial_size=1024):
+        self.dtypes = dict(dtypes)
+        self._cols = {name: np.empty(initial_size, dtype) for name, dtype in self.dtypes.items()}
+        self.start = 0
+        self.stop = 0
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def view(self, name):
+        return self._cols[name][self.start:self.stop]
+
+    def append(self, **values):
+        if self.stop == len(next(iter(self._cols.values()))):
+            self._reserve(len(self) + 1)
+        for name, value in values.items():
+            self._cols[name][self.stop] = value
+        self.stop += 1
+
+    def popleft(self):
+        self.start += 1
+
+    def clear(self):
+        self.start = self.stop = 0
+
+    def replace(self, **columns):
+        """Reset the buffer to the given full columns (same length each)."""
+        n = len(next(iter(columns.values())))
+        self.clear()
+        self._reserve(n)
+        for name, values in columns.items():
+            self._cols[name][:n] = values
+        self.stop = n
+
+    def _reserve(self, needed):
+        size = len(next(iter(self._cols.values())))
+        live = len(self)
+        new_size = size if needed <= size // 2 else max(2 * needed, 1024)
+        for name, col in self._cols.items():
+            if new_size != size:
+                new_col = np.empty(new_size, col.dtype)
+            else:
+                new_col = col
+            new_col[:live] = col[self.start:self.stop]
+            self._cols[name] = new_col
+        self.start, self.stop = 0, live
+
+
+# Item types whose text is summarized when they decay away.
+SUMMARIZED_TYPES = ["dialogue", "text", "text_file", "emotion_state"]
+
 
 class MemoryAgent:
-    def __init__(self, capacity=1000, decay_rate=0.001, storage_dir="memory_storage", batch_size=5, batch_time_seconds=60, summarizer=None):
-        self._memory_lock = threading.Lock()
+    """
+    decay_mode="sweep" (default) multiplies every weight by (1 - decay_rate) on each
+    decay_memory() call. decay_mode="lazy" stores the weight set at insertion and
+    derives the current one as weight * (1 - decay_rate) ** elapsed_ticks, one tick
+    per `decay_tick_seconds`; expired items are reaped a few at a time as new
+    memories arrive, so no periodic full sweep is needed.
+
+    persistence="snapshot" (default) rewrites memory_index.json on save_index().
+    persistence="journal" appends each mutation to a MemoryJournal and only
+    writes a full snapshot when the journal grows past its compaction limit;
+    load_index() replays snapshot + journal.
+    """
+
+    def __init__(self, capacity=1000, decay_rate=0.001, storage_dir="memory_storage", batch_size=5, batch_time_seconds=60, summarizer=None,
+                 decay_mode="sweep", decay_tick_seconds=60.0, persistence="snapshot", journal_options=None,
+                 text_cache_bytes=1 << 20, vector_index_options=None):
+        if decay_mode not in ("sweep", "lazy"):
+            raise ValueError(f"Unknown decay_mode {decay_mode}")
+        if persistence not in ("snapshot", "journal"):
+            raise ValueError(f"Unknown persistence {persistence}")
+        self._memory_lock = threading.RLock()
         self.capacity = capacity
         self.decay_rate = decay_rate
+        self.decay_mode = decay_mode
+        self.decay_tick_seconds = decay_tick_seconds
+        self.reap_batch = 8
+        self._reap_cursor = 0  # where the next lazy reap scan starts
+        # Decayed items waiting for the background summarizer. While a job is
+        # queued but not started, new items join it instead of queueing another.
+        self._summary_lock = threading.Lock()
+        self._summary_pending = []
+        self._summary_future = None
+        self._last_summary_future = None
         self.memory_bank = deque(maxlen=capacity)
+        # Secondary indexes, kept in step with memory_bank including maxlen eviction.
+        self._by_id = {}
+        self._by_tag = {}  # tag -> {id: item}, oldest first
+        self._by_type = {}  # data_type -> {id: item}, oldest first
+        # ndarray payloads, for search(); options such as approximate_threshold/n_probe go to VectorIndex.
+        self._vector_index = VectorIndex(**(vector_index_options or {}))
+        # Columns parallel to memory_bank: timestamps make time windows a bisect +
+        # tail slice, weights/important make decay a single vectorized pass.
+        self._columns = _ColumnBuffer({
+            "timestamp": np.float64,
+            "weight": np.float64,
+            "decay_origin": np.float64,  # when the weight was last set (lazy mode)
+            "important": np.bool_,
+            "seq": np.int64,
+        })
+        self._time_ordered = True
+        self._next_seq = 0
         self.storage_dir = storage_dir
         self.batch_size = batch_size
         self.batch_time_seconds = batch_time_seconds
         self._text_log_batch = []
         self._batch_lock = threading.Lock()
         self._last_batch_time = time.time()
+        # Contents of batch log files (which never change once written) as
+        # (text, UTF-8 size), LRU by total size in bytes.
+        self.text_cache_bytes = text_cache_bytes
+        self._text_cache = OrderedDict()
+        self._text_cache_size = 0
+        self._text_cache_lock = threading.Lock()
 
         if not os.path.exists(self.storage_dir):
             os.makedirs(self.storage_dir)
 
-        self._batch_flush_thread = threading.Thread(target=self._batch_flush_worker, daemon=True)
-        self._batch_flush_thread.start()
+        self._vectors = None
+        self.journal = None
+        self._replaying = False
+        if persistence == "journal":
+            self.journal = MemoryJournal(self.storage_dir, before_sync=self._flush_vectors, **(journal_options or {}))
+
+        # Periodic work runs on the process-wide scheduler thread rather than a
+        # thread per agent.
+        scheduler = get_scheduler()
+        self._scheduled_jobs = [
+            scheduler.schedule(self._flush_text_log_if_due, interval=self.batch_time_seconds / 2,
+                               name="MemoryAgent text log flush", on_shutdown=self.flush)
+        ]
+        if self.journal is not None:
+            self._scheduled_jobs.append(
+                scheduler.schedule(self.journal.sync_if_due, interval=self.journal.fsync_interval,
+                                   name="MemoryAgent journal fsync", on_shutdown=self.journal.sync)
+            )
 
         # Use passed summarizer or create a default one
         if summarizer is None:
@@ -80,44 +241,418 @@ class MemoryAgent:
             metadata=metadata
         )
         with self._memory_lock:
-            self.memory_bank.append(item)
+            if self.decay_mode == "lazy":
+                self._reap_expired_head(self.reap_batch)
+            self._append_item(item)
+
+    def _index_item(self, item):
+        self._by_id[item.id] = item
+        if isinstance(item.data, np.ndarray):
+            self._vector_index.add(item.id, item.data)
+        self._by_type.setdefault(item.data_type, {})[item.id] = item
+        tag = item.metadata.get("tag")
+        if tag is not None:
+            self._by_tag.setdefault(tag, {})[item.id] = item
+
+    def _unindex_item(self, item):
+        if self._by_id.get(item.id) is item:
+            del self._by_id[item.id]
+            self._vector_index.remove(item.id)
+        for index, key in ((self._by_type, item.data_type), (self._by_tag, item.metadata.get("tag"))):
+            bucket = index.get(key)
+            if bucket is not None and bucket.get(item.id) is item:
+                del bucket[item.id]
+                if not bucket:
+                    del index[key]
+
+    def _append_item(self, item):
+        """Append to memory_bank and the indexes. Caller holds _memory_lock."""
+        if len(self.memory_bank) == self.memory_bank.maxlen and self.decay_mode == "lazy":
+            # Make room from expired items before evicting a live one.
+            self._reap_expired_head(self.reap_batch)
+        if len(self.memory_bank) == self.memory_bank.maxlen:
+            evicted = self.memory_bank[0]
+            self._unindex_item(evicted)
+            self._unbind(evicted, self._effective_weights(time.time(), slice(0, 1))[0])
+            self._columns.popleft()
+        if len(self._columns) and item.timestamp < self._columns.view("timestamp")[-1]:
+            self._time_ordered = False
+        weight = item.weight
+        self.memory_bank.append(item)
+        self._columns.append(
+            timestamp=item.timestamp,
+            weight=weight,
+            decay_origin=item._decay_origin or time.time(),
+            important=bool(item.metadata.get("important", False)),
+            seq=self._next_seq
+        )
+        item._owner, item._seq, item._decay_origin = self, self._next_seq, None
+        self._next_seq += 1
+        self._index_item(item)
+        if self.journal is not None and not self._replaying:
+            self._persist_vector(item)
+            self._log("store", item=item.to_dict())
+
+    def _vector_store(self):
+        if self._vectors is None:
+            self._vectors = VectorStore(os.path.join(self.storage_dir, "vectors.f32"))
+        return self._vectors
+
+    def _flush_vectors(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+
+    def _persist_vector(self, item):
+        """Write an ndarray payload to the vector sidecar once, remembering its offset."""
+        if isinstance(item.data, np.ndarray) and item._vector_ref is None:
+            item._vector_ref = self._vector_store().append(item.data)
+
+    def _item_from_dict(self, d):
+        """MemoryItem.from_dict plus a zero-copy mmap view for vector payloads."""
+        item = MemoryItem.from_dict(d)
+        ref = d.get("vector")
+        if ref is not None:
+            try:
+                item.data = self._vector_store().read(ref)
+                item._vector_ref = ref
+            except Exception as e:
+                print(f"[MemoryAgent] Could not load vector for {item.id}: {e}")
+        return item
+
+    def _log(self, op, **fields):
+        """Append a mutation to the journal (journal persistence only)."""
+        if self.journal is None or self._replaying:
+            return
+        with self._memory_lock:
+            self.journal.append(op, **fields)
+            if self.journal.needs_compaction():
+                self.journal.write_snapshot(self._item_dicts())
+
+    def _apply_record(self, record):
+        op = record.get("op")
+        if op == "store":
+            self._append_item(self._item_from_dict(record["item"]))
+        elif op == "modify":
+            self.enrich_metadata(record["id"], record["metadata"])
+        elif op == "mark":
+            self.mark_memory_important(record["id"])
+        elif op == "unmark":
+            self.unmark_memory_important(record["id"])
+        elif op == "weight":
+            item = self._by_id.get(record["id"])
+            if item is not None:
+                item._weight = record["weight"]
+                self._write_weight(item, record["weight"], record.get("at"))
+        elif op == "decay":
+            self._sweep_decay(record["rate"])
+        elif op == "remove":
+            self._remove_ids(record["ids"])
+        else:
+            print(f"[MemoryAgent] Unknown journal record: {op}")
+
+    def _unbind(self, item, weight):
+        """Detach an item leaving the bank, keeping its last weight on the item."""
+        if item._owner is self:
+            item._weight = float(weight)
+            item._owner = item._seq = None
+
+    def _row_of(self, item):
+        """Row of a bound item, or None if it has left the bank. Caller holds _memory_lock."""
+        if item._owner is not self or item._seq is None:
+            return None  # evicted since the caller looked
+        seqs = self._columns.view("seq")
+        row = int(np.searchsorted(seqs, item._seq))
+        if row < len(seqs) and seqs[row] == item._seq:
+            return row
+        return None
+
+    def _effective_weights(self, now, rows=slice(None)):
+        """Current weights of the given rows; in lazy mode decayed up to `now`."""
+        weights = self._columns.view("weight")[rows]
+        if self.decay_mode != "lazy":
+            return weights
+        elapsed = np.maximum(now - self._columns.view("decay_origin")[rows], 0.0) / self.decay_tick_seconds
+        decayed = weights * (1 - self.decay_rate) ** elapsed
+        return np.where(self._columns.view("important")[rows], weights, decayed)
+
+    def _read_weight(self, item):
+        with self._memory_lock:
+            row = self._row_of(item)
+            if row is None:
+                return item._weight
+            return float(self._effective_weights(time.time(), slice(row, row + 1))[0])
+
+    def _write_weight(self, item, value, now=None):
+        with self._memory_lock:
+            row = self._row_of(item)
+            if row is not None:
+                now = now or time.time()
+                self._columns.view("weight")[row] = value
+                self._columns.view("decay_origin")[row] = now
+                self._log("weight", id=item.id, weight=float(value), at=now)
+
+    def _set_important(self, item, flag):
+        with self._memory_lock:
+            row = self._row_of(item)
+            if row is not None:
+                if self.decay_mode == "lazy" and not self._replaying:
+                    # Freeze (or resume) decay from the weight as it stands now.
+                    # On replay the journal's preceding "weight" record did this.
+                    now = time.time()
+                    self._write_weight(item, self._effective_weights(now, slice(row, row + 1))[0], now)
+                self._columns.view("important")[row] = flag
+
+    def _reap_expired_head(self, limit):
+        """
+        Lazy mode: remove up to `limit` expired items, scanning a bounded window
+        of rows from the front of the bank. Items expire roughly in insertion
+        order, so this keeps up with decay without a full sweep; important or
+        still-live rows are skipped rather than ending the scan, and the window
+        moves on past them when it finds nothing. Reaped text goes straight to
+        the background summarizer. Caller holds _memory_lock.
+        """
+        n = len(self.memory_bank)
+        start = self._reap_cursor if self._reap_cursor < n else 0
+        rows = slice(start, min(start + max(limit * 8, 64), n))
+        weights = self._effective_weights(time.time(), rows)
+        expired = ~self._columns.view("important")[rows] & (weights < 0.01)
+        hits = np.flatnonzero(expired)[:limit]
+        count = len(hits)
+        if count < limit:
+            # Nothing more to find here; look further along next time.
+            end = rows.stop - count
+            self._reap_cursor = end if end < n - count else 0
+        if not count:
+            return 0
+        if start == 0 and hits[-1] == count - 1:
+            removed = []
+            for weight in weights[:count].tolist():
+                item = self.memory_bank.popleft()
+                self._columns.popleft()
+                self._unindex_item(item)
+                self._unbind(item, weight)
+                removed.append(item)
+        else:
+            mask = np.zeros(n, dtype=np.bool_)
+            mask[start + hits] = True
+            all_weights = np.zeros(n)
+            all_weights[start + hits] = weights[hits]
+            removed = self._compact(mask, all_weights)
+        decayed_items = [item for item in removed if item.data_type in SUMMARIZED_TYPES]
+        if self.summarizer and decayed_items and not self._replaying:
+            self._queue_summary(decayed_items)  # joins the pending job if one is queued
+        self._log("remove", ids=[item.id for item in removed])
+        return count
+
+    def _rebuild_indexes(self):
+        self._by_id.clear()
+        self._by_tag.clear()
+        self._by_type.clear()
+        self._vector_index.clear()
+        for item in self.memory_bank:
+            self._index_item(item)
+        self._rebuild_columns()
+
+    def _rebuild_columns(self):
+        items = self.memory_bank
+        n = len(items)
+        timestamps = np.fromiter((item.timestamp for item in items), np.float64, n)
+        weights = np.fromiter((item.weight for item in items), np.float64, n)
+        now = time.time()
+        origins = np.fromiter((item._decay_origin or now for item in items), np.float64, n)
+        important = np.fromiter((bool(item.metadata.get("important", False)) for item in items), np.bool_, n)
+        seqs = np.arange(self._next_seq, self._next_seq + n, dtype=np.int64)
+        self._next_seq += n
+        self._columns.replace(timestamp=timestamps, weight=weights, decay_origin=origins, important=important, seq=seqs)
+        for item, seq in zip(items, seqs.tolist()):
+            item._owner, item._seq, item._decay_origin = self, seq, None
+        self._time_ordered = bool(np.all(np.diff(timestamps) >= 0))
+
+    def _compact(self, remove_mask, weights):
+        """
+        Drop the flagged rows from memory_bank, the columns and the indexes in
+        one pass. `weights` are the current weights, kept on the removed items.
+        Returns the removed items. Caller holds _memory_lock.
+        """
+        items = list(self.memory_bank)
+        keep = ~remove_mask
+        removed_rows = np.flatnonzero(remove_mask)
+        removed_weights = weights[removed_rows].tolist()
+        removed = [items[row] for row in removed_rows.tolist()]
+
+        self.memory_bank.clear()
+        self.memory_bank.extend(compress(items, keep.tolist()))
+        self._columns.replace(**{name: self._columns.view(name)[keep] for name in self._columns.dtypes})
+        for item, weight in zip(removed, removed_weights):
+            self._unindex_item(item)
+            self._unbind(item, weight)
+        return removed
+
+    def _remove_ids(self, ids):
+        """Remove the given memories in one compaction pass. Caller holds _memory_lock."""
+        mask = np.zeros(len(self.memory_bank), dtype=np.bool_)
+        for memory_id in ids:
+            item = self._by_id.get(memory_id)
+            row = None if item is None else self._row_of(item)
+            if row is not None:
+                mask[row] = True
+        if not mask.any():
+            return []
+        return self._compact(mask, self._effective_weights(time.time()))
+
+    def _sweep_decay(self, rate):
+        """One multiplicative decay step over every non-important weight. Caller holds _memory_lock."""
+        weights = self._columns.view("weight")
+        decaying = ~self._columns.view("important")
+        np.multiply(weights, 1 - rate, out=weights, where=decaying)
+        expired = decaying & (weights < 0.01)
+        return self._compact(expired, weights) if expired.any() else []
+
+    def _window_candidates(self, time_window, now):
+        """Items with timestamp >= now - time_window, oldest first, via bisect on the timestamp column."""
+        with self._memory_lock:
+            timestamps = self._columns.view("timestamp")
+            first = int(np.searchsorted(timestamps, now - time_window, side="left"))
+            tail = list(islice(reversed(self.memory_bank), len(timestamps) - first))
+        tail.reverse()
+        return tail
+
+    def get_memory(self, memory_id):
+        return self._by_id.get(memory_id)
 
     def get_memories(self, data_type=None, metadata_filter=None, time_window=None, prioritize=False):
         now = time.time()
         results = []
-        for item in self.memory_bank:
+        if time_window and self._time_ordered:
+            candidates = self._window_candidates(time_window, now)
+        elif data_type:
+            candidates = list(self._by_type.get(data_type, {}).values())
+        else:
+            candidates = self.memory_bank
+        for item in candidates:
             if data_type and item.data_type != data_type:
                 continue
             if metadata_filter and not all(item.metadata.get(k) == v for k, v in metadata_filter.items()):
                 continue
             if time_window and (now - item.timestamp) > time_window:
                 continue
+            if self.decay_mode == "lazy" and not item.metadata.get("important") and item.weight < 0.01:
+                continue  # expired, just not reaped yet
             results.append(item)
         if prioritize:
             results.sort(key=lambda x: (x.metadata.get("important", False), x.weight), reverse=True)
         return results
 
+    def search(self, query_vector, k=5, data_type=None):
+        """
+        Return up to k (MemoryItem, score) pairs whose vector payloads have the
+        highest dot product with `query_vector`, best first.
+        """
+        with self._memory_lock:
+            # Over-fetch when filtering so the filter still leaves k results.
+            fetch = k if data_type is None else k * 4
+            while True:
+                hits = self._vector_index.search(query_vector, fetch)
+                results = [(self._by_id[memory_id], score) for memory_id, score in hits]
+                if data_type is not None:
+                    results = [(item, score) for item, score in results if item.data_type == data_type]
+                if len(results) >= k or fetch >= len(self._vector_index):
+                    return results[:k]
+                fetch *= 4
+
     def enrich_metadata(self, memory_id, new_metadata):
-        for item in self.memory_bank:
-            if item.id == memory_id:
-                item.metadata.update(new_metadata)
-                return True
-        return False
+        with self._memory_lock:
+            item = self._by_id.get(memory_id)
+            if item is None:
+                return False
+            old_tag = item.metadata.get("tag")
+            item.metadata.update(new_metadata)
+            if item.metadata.get("tag") != old_tag:
+                self._retag_item(item, old_tag)
+            if "important" in new_metadata:
+                self._set_important(item, bool(new_metadata["important"]))
+            self._log("modify", id=memory_id, metadata=new_metadata)
+            return True
+
+    def _retag_item(self, item, old_tag):
+        """Move an item between tag buckets, keeping each bucket in insertion (_seq) order."""
+        bucket = self._by_tag.get(old_tag)
+        if bucket is not None and bucket.get(item.id) is item:
+            del bucket[item.id]
+            if not bucket:
+                del self._by_tag[old_tag]
+        tag = item.metadata.get("tag")
+        if tag is None:
+            return
+        bucket = self._by_tag.setdefault(tag, {})
+        newest = next(reversed(bucket.values()), None)
+        bucket[item.id] = item
+        if newest is not None and newest._seq > item._seq:
+            self._by_tag[tag] = dict(sorted(bucket.items(), key=lambda entry: entry[1]._seq))
 
     def save_index(self, filename="memory_index.json"):
-        index_list = [item.to_dict() for item in self.memory_bank]
+        if self.journal is not None:
+            # Every change is already journaled; just make it durable.
+            self.journal.sync()
+            return
+        index_list = self._item_dicts()
         with open(os.path.join(self.storage_dir, filename), "w") as f:
             json.dump(index_list, f, indent=2)
 
+    def _item_dicts(self, data_type=None):
+        """
+        to_dict() of every item (or every item of one type) as of one moment.
+        Items and weights are taken under _memory_lock in one pass over the
+        weight column, so stores from other threads can't change the bank
+        mid-iteration; the caller writes the dicts out after the lock is released.
+        """
+        with self._memory_lock:
+            now = time.time()
+            weights = self._effective_weights(now).tolist()
+            pairs = list(zip(self.memory_bank, weights))
+            if data_type is not None:
+                pairs = [(item, weight) for item, weight in pairs if item.data_type == data_type]
+            for item, _ in pairs:
+                self._persist_vector(item)
+            dicts = [item.to_dict(weight, now) for item, weight in pairs]
+        self._flush_vectors()
+        return dicts
+
     def load_index(self, filename="memory_index.json"):
+        if self.journal is not None:
+            self._load_journal(filename)
+            return
         path = os.path.join(self.storage_dir, filename)
         if os.path.exists(path):
             with open(path, "r") as f:
                 index_list = json.load(f)
+            self._replace_bank(index_list)
+
+    def _replace_bank(self, index_list):
+        with self._memory_lock:
+            for item in self.memory_bank:
+                self._unbind(item, item.weight)
             self.memory_bank.clear()
             for d in index_list:
-                item = MemoryItem.from_dict(d)
-                self.memory_bank.append(item)
+                self.memory_bank.append(self._item_from_dict(d))
+            self._rebuild_indexes()
+
+    def _load_journal(self, legacy_filename):
+        snapshot, records = self.journal.load()
+        legacy_path = os.path.join(self.storage_dir, legacy_filename)
+        if not snapshot and not records and os.path.exists(legacy_path):
+            # First start in journal mode: adopt the old pretty-printed index.
+            with open(legacy_path, "r") as f:
+                snapshot = json.load(f)
+            self.journal.write_snapshot(snapshot)
+        with self._memory_lock:
+            self._replaying = True
+            try:
+                self._replace_bank(snapshot)
+                for record in records:
+                    self._apply_record(record)
+            finally:
+                self._replaying = False
 
     def save_image(self, image_bytes, filename=None):
         filename = filename or f"img_{int(time.time()*1000)}.png"
@@ -134,25 +669,90 @@ class MemoryAgent:
             summary["by_type"][m.data_type] = summary["by_type"].get(m.data_type, 0) + 1
         return summary
 
-    def _batch_flush_worker(self):
-        while True:
-            time.sleep(self.batch_time_seconds / 2)
-            with self._batch_lock:
-                if self._text_log_batch and (time.time() - self._last_batch_time) >= self.batch_time_seconds:
-                    self._flush_text_log_batch()
+    def _flush_text_log_if_due(self):
+        with self._batch_lock:
+            if self._text_log_batch and (time.time() - self._last_batch_time) >= self.batch_time_seconds:
+                self._flush_text_log_batch()
+
+    def flush(self):
+        """Write out the pending text log batch and make journal/vector writes durable."""
+        with self._batch_lock:
+            self._flush_text_log_batch()
+        if self.journal is not None:
+            self.journal.sync()
+        self._flush_vectors()
+
+    def close(self):
+        """Stop this agent's scheduled jobs and flush everything it buffers."""
+        for job in self._scheduled_jobs:
+            job.cancel()
+        self._scheduled_jobs = []
+        self.flush()
+        if self.journal is not None:
+            self.journal.close()
+        if self._vectors is not None:
+            self._vectors.close()
 
     def _flush_text_log_batch(self):
         if not self._text_log_batch:
             return
-        filename = f"batch_log_{int(time.time()*1000)}.txt"
+        # One file per batch: two flushes in the same millisecond must not share a
+        # file, since the file's contents are cached as written.
+        stamp = int(time.time() * 1000)
+        while os.path.exists(os.path.join(self.storage_dir, f"batch_log_{stamp}.txt")):
+            stamp += 1
+        filename = f"batch_log_{stamp}.txt"
         filepath = os.path.join(self.storage_dir, filename)
-        with open(filepath, "a", encoding="utf-8") as f:
-            f.write("\n".join(self._text_log_batch) + "\n")
+        content = "\n".join(self._text_log_batch) + "\n"
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(content)
+        self._cache_text(filename, content)
         self.store_memory(data=filename, data_type="text_file", weight=1.0,
                         metadata={"description": "batched log file", "batch": True})
         self._text_log_batch.clear()
         self._last_batch_time = time.time()
 
+    def _cache_text(self, filename, content):
+        size = len(content.encode("utf-8"))  # the budget is in bytes, not characters
+        if size > self.text_cache_bytes:
+            return
+        with self._text_cache_lock:
+            old = self._text_cache.pop(filename, None)
+            if old is not None:
+                self._text_cache_size -= old[1]
+            self._text_cache[filename] = (content, size)
+            self._text_cache_size += size
+            while self._text_cache_size > self.text_cache_bytes:
+                _, (_, evicted_size) = self._text_cache.popitem(last=False)
+                self._text_cache_size -= evicted_size
+
+    def read_text_file(self, filename):
+        """Contents of a text file in storage_dir, served from the cache when possible."""
+        with self._text_cache_lock:
+            cached = self._text_cache.get(filename)
+            if cached is not None:
+                self._text_cache.move_to_end(filename)
+                return cached[0]
+        with open(os.path.join(self.storage_dir, filename), "r", encoding="utf-8") as f:
+            content = f.read()
+        self._cache_text(filename, content)
+        return content
+
+    def recent_text_files(self, limit=5, time_window=None):
+        """Up to `limit` newest text_file memories, newest first, without scanning the bank."""
+        now = time.time()
+        results = []
+        with self._memory_lock:
+            for item in reversed(self._by_type.get("text_file", {}).values()):
+                if len(results) >= limit:
+                    break
+                if time_window and (now - item.timestamp) > time_window:
+                    if self._time_ordered:
+                        break
+                    continue
+                results.append(item)
+        return results
+
     def save_text_log(self, text, filename=None):
         with self._batch_lock:
             self._text_log_batch.append(text)
@@ -161,56 +761,101 @@ class MemoryAgent:
         return None
 
     def mark_memory_important(self, memory_id):
-        for item in self.memory_bank:
-            if item.id == memory_id:
-                item.metadata["important"] = True
-                return True
-        return False
+        item = self._by_id.get(memory_id)
+        if item is None:
+            return False
+        item.metadata["important"] = True
+        self._set_important(item, True)
+        self._log("mark", id=memory_id)
+        return True
 
     def unmark_memory_important(self, memory_id):
-        for item in self.memory_bank:
-            if item.id == memory_id and "important" in item.metadata:
-                del item.metadata["important"]
-                return True
-        return False
+        item = self._by_id.get(memory_id)
+        if item is None or "important" not in item.metadata:
+            return False
+        del item.metadata["important"]
+        self._set_important(item, False)
+        self._log("unmark", id=memory_id)
+        return True
 
 
 
     def decay_memory(self):
-        decayed_items = []
-        for item in list(self.memory_bank):
-            if item.metadata.get("important", False):
-                continue
-            item.weight *= (1 - self.decay_rate)
-            if item.weight < 0.01:
-                if item.data_type in ["dialogue", "text", "text_file", "emotion_state"]:
-                    decayed_items.append(item)
-                self.memory_bank.remove(item)
+        """
+        Decay weights and drop expired items. Text from decayed items is
+        summarized in the background; returns a Future for that summary, or
+        None when there is nothing to summarize. Nothing is rewritten here:
+        journal mode has logged the change, and snapshot mode saves on
+        save_index() (AxiomDispatcher.save_on_exit calls it).
+        """
+        with self._memory_lock:
+            if self.decay_mode == "lazy":
+                # Optional here: the reaper already removes and summarizes expired
+                # items as new ones arrive. This catches up on all of them at once.
+                weights = self._effective_weights(time.time())
+                expired = ~self._columns.view("important") & (weights < 0.01)
+                removed = self._compact(expired, weights) if expired.any() else []
+                if removed:
+                    self._log("remove", ids=[item.id for item in removed])
+            else:
+                removed = self._sweep_decay(self.decay_rate)
+                self._log("decay", rate=self.decay_rate)
+        decayed_items = [item for item in removed if item.data_type in SUMMARIZED_TYPES]
 
         if self.summarizer and decayed_items:
-            text_chunks = [item.data for item in decayed_items if isinstance(item.data, str)]
-            recent_text = "\n".join(text_chunks)
-            if recent_text.strip():
-                summary = self.summarizer.summarize(recent_text)
-
-                timestamps = [item.timestamp for item in decayed_items]
-                metadata = {
-                    "source": "decay",
-                    "summarized_count": len(decayed_items),
-                    "from_timestamp": min(timestamps),
-                    "to_timestamp": max(timestamps)
-                }
-
-                self.store_memory(
-                    data=summary,
-                    data_type="summary",
-                    weight=1.0,
-                    metadata=metadata
-                )
+            return self._queue_summary(decayed_items)
+        return None
 
-        self.save_index()
+    def _queue_summary(self, items):
+        """Hand decayed items to the background summarizer; returns a Future."""
+        with self._summary_lock:
+            self._summary_pending.extend(items)
+            if self._summary_future is None:
+                self._summary_future = SummarizationWorker.shared().submit(self._run_summary_job)
+                self._last_summary_future = self._summary_future
+            return self._summary_future
+
+    def _run_summary_job(self):
+        with self._summary_lock:
+            items, self._summary_pending = self._summary_pending, []
+            self._summary_future = None
+        return self._summarize_items(items)
+
+    def _summarize_items(self, decayed_items):
+        """Summarize the text of decayed items and store it as a summary memory."""
+        text_chunks = [item.data for item in decayed_items if isinstance(item.data, str)]
+        recent_text = "\n".join(text_chunks)
+        if not recent_text.strip():
+            return None
+        summary = self.summarizer.summarize(recent_text)
+
+        timestamps = [item.timestamp for item in decayed_items]
+        metadata = {
+            "source": "decay",
+            "summarized_count": len(decayed_items),
+            "from_timestamp": min(timestamps),
+            "to_timestamp": max(timestamps)
+        }
+
+        self.store_memory(
+            data=summary,
+            data_type="summary",
+            weight=1.0,
+            metadata=metadata
+        )
+        return summary
+
+    def wait_for_summaries(self, timeout=None):
+        """Block until the most recently queued summary job has finished."""
+        future = self._last_summary_future
+        if future is None:
+            return None
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            print(f"[MemoryAgent] Summary not completed: {e}")
+            return None
 
-                
     def store_tagged_memory(self, tag, data, data_type="emotion_state", weight=1.0, metadata=None):
         """Stores memory with a custom tag in metadata."""
         if metadata is None:
@@ -220,15 +865,14 @@ class MemoryAgent:
     
     def retrieve_latest_tagged_memory(self, tag):
         """Fetch the most recent memory with a specific tag."""
-        
-        for item in reversed(self.memory_bank):
-            if item.metadata.get("tag") == tag:
-                return item
-        return None
+        bucket = self._by_tag.get(tag)
+        if not bucket:
+            return None
+        return next(reversed(bucket.values()))
 
     def save_dialogue_memory(self, filename="dialogue_memory.json"):
         """Save all dialogue memories to a JSON file."""
-        dialogue_memories = [item.to_dict() for item in self.memory_bank if item.data_type == "dialogue"]
+        dialogue_memories = self._item_dicts(data_type="dialogue")
         filepath = os.path.join(self.storage_dir, filename)
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(dialogue_memories, f, indent=2)
@@ -240,9 +884,9 @@ class MemoryAgent:
         if os.path.exists(filepath):
             with open(filepath, "r", encoding="utf-8") as f:
                 dialogue_memories = json.load(f)
-            for d in dialogue_memories:
-                item = MemoryItem.from_dict(d)
-                self.memory_bank.append(item)
+            with self._memory_lock:
+                for d in dialogue_memories:
+                    self._append_item(self._item_from_dict(d))
             print(f"Loaded {len(dialogue_memories)} dialogue memories from {filepath}")
         else:
             print(f"No dialogue memory file found at {filepath}")
@@ -289,6 +933,13 @@ class MemoryAgent:
             elif action == "unmark_important":
                 return self.unmark_memory_important(command.get("memory_id"))
 
+            elif action == "search":
+                return self.search(
+                    query_vector=np.asarray(command.get("query")),
+                    k=command.get("k", 5),
+                    data_type=command.get("data_type")
+                )
+
             elif action == "summarize":
                 return self.get_recent_memories_summary(
                     time_window=command.get("time_window", 300)
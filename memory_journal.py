@@ -0,0 +1,107 @@
+import os
+import json
+from jsonl_writer import JsonlWriter, parse_records
+
+
+class MemoryJournal:
+    """
+    Write-ahead journal for a MemoryAgent. Every mutation is appended as one
+    compact JSON line through a JsonlWriter, which fsyncs in batches. Once the
+    journal holds `compact_every` records the owner writes a snapshot and the
+    journal starts over, so persistence cost follows the number of changes
+    rather than the size of the bank.
+
+    Each snapshot has a generation number, written on its first line, and
+    every record carries the generation it was appended under. If a crash
+    lands between replacing the snapshot and truncating the journal, load()
+    skips the old records the snapshot already holds.
+    """
+
+    def __init__(self, storage_dir, name="memory", fsync_every=64, fsync_interval=1.0, compact_every=10000, before_sync=None):
+        self.snapshot_path = os.path.join(storage_dir, f"{name}_snapshot.json")
+        self.journal_path = os.path.join(storage_dir, f"{name}_journal.jsonl")
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.records = self._count_records()
+        self.generation = self._snapshot_generation()
+        self.before_sync = before_sync  # e.g. make sidecar files durable before the records that point at them
+        self._writer = JsonlWriter(self.journal_path, fsync_every, fsync_interval, before_sync)
+
+    def _count_records(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _snapshot_generation(self):
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            header = f.readline()
+        if header.startswith('{"generation"'):
+            return json.loads(header)["generation"]
+        return 0  # snapshots from before generations were recorded
+
+    def append(self, op, **fields):
+        record = {"op": op, "gen": self.generation}
+        record.update(fields)
+        try:
+            line = json.dumps(record, separators=(",", ":"))
+        except (TypeError, ValueError) as e:
+            print(f"[MemoryJournal] Could not journal {op}: {e}")
+            return
+        self._writer.append(line)
+        self.records += 1
+
+    def sync(self):
+        self._writer.sync()
+
+    def sync_if_due(self):
+        """Fsync pending records once they are older than fsync_interval."""
+        self._writer.sync_if_due()
+
+    def needs_compaction(self):
+        return self.records >= self.compact_every
+
+    def write_snapshot(self, item_dicts):
+        """Atomically replace the snapshot and truncate the journal."""
+        if self.before_sync is not None:
+            self.before_sync()
+        generation = self.generation + 1
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"generation": generation}) + "\n")
+            json.dump(item_dicts, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+
+        def swap_in():
+            os.replace(tmp_path, self.snapshot_path)
+            self.generation = generation
+
+        self._writer.truncate(before=swap_in)
+        self.records = 0
+
+    def load(self):
+        """Return (snapshot item dicts, journal records) for replay."""
+        snapshot = []
+        generation = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                header = f.readline()
+                if header.startswith('{"generation"'):
+                    generation = json.loads(header)["generation"]
+                    snapshot = json.load(f)
+                else:
+                    snapshot = json.loads(header + f.read())
+
+        self._writer.flush()
+        records = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                records = parse_records(f, self.journal_path, "MemoryJournal")
+        # Records older than the snapshot are already in it.
+        return snapshot, [record for record in records if record.get("gen", 0) >= generation]
+
+    def close(self):
+        self._writer.close()
@@ -0,0 +1,231 @@
+import os
+import time
+import queue
+import itertools
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Lower runs first: interactive chat ahead of the monologue ahead of summaries.
+PRIORITY_CHAT = 0
+PRIORITY_MONOLOGUE = 5
+PRIORITY_BACKGROUND = 10
+
+
+class InferenceQueue:
+    """
+    Bounded priority queue of inference jobs for one model, run by a single
+    worker thread so the model's n_threads are never oversubscribed. A job is
+    a callable taking the loaded Llama object; submit() returns a Future for
+    its result. A full queue makes submit() wait (or fail after `timeout`),
+    which pushes back on producers, and stats() reports depth and wait times.
+
+    Jobs run one at a time: llama-cpp-python's Llama object decodes a single
+    sequence, so prompts from different requests cannot share a decode pass.
+    What the queue buys is ordering by priority, no thread racing for the
+    model, and visibility into how far behind the model is.
+    """
+
+    def __init__(self, entry, maxsize=64):
+        self._entry = entry
+        self._queue = queue.PriorityQueue(maxsize=maxsize)
+        self._seq = itertools.count()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def submit(self, job, priority=PRIORITY_BACKGROUND, timeout=None):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+                self._thread.start()
+        future = Future()
+        try:
+            self._queue.put((priority, next(self._seq), job, future, time.time()), timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return future
+
+    def _run(self):
+        while True:
+            _, _, job, future, enqueued = self._queue.get()
+            if job is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.time()
+            try:
+                with self._entry.lock:
+                    result = job(self._entry.load())
+            except Exception as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+            with self._stats_lock:
+                self._wait_total += started - enqueued
+                self._run_total += time.time() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put((float("inf"), next(self._seq), None, None, time.time()))
+
+    def stats(self):
+        with self._stats_lock:
+            done = self._completed + self._failed
+            return {
+                "depth": self._queue.qsize(),
+                "max_depth": self._max_depth,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait": self._wait_total / done if done else 0.0,
+                "avg_run": self._run_total / done if done else 0.0,
+            }
+
+
+class _ModelEntry:
+    def __init__(self, model_path, n_ctx, n_threads):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.model = None
+        self.lock = threading.RLock()  # llama.cpp contexts are not safe for concurrent calls
+        self.refs = 0
+        self.inference = InferenceQueue(self)
+
+    def load(self):
+        """Construct the model on first use. Caller holds self.lock."""
+        if self.model is None:
+            from llama_cpp import Llama  # deferred: importing llama_cpp alone costs noticeable startup time
+            print(f"[ModelRegistry] Loading {self.model_path} (n_ctx={self.n_ctx}, n_threads={self.n_threads})")
+            self.model = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads)
+        return self.model
+
+
+class ModelHandle:
+    """
+    Reference-counted handle to a shared Llama instance. The model is only
+    constructed on first use (or by `warm_up()`). Generation should go through
+    `submit()`/`run()`, which queue the work by priority. Calling the handle
+    behaves like calling the Llama object directly, serialized per model. Use
+    `locked()` for short work such as tokenizing.
+    """
+
+    def __init__(self, registry, key, entry):
+        self._registry = registry
+        self.key = key
+        self._entry = entry
+        self._released = False
+
+    def __call__(self, *args, **kwargs):
+        with self._entry.lock:
+            return self._entry.load()(*args, **kwargs)
+
+    def submit(self, job, priority=PRIORITY_BACKGROUND, timeout=None):
+        """Queue `job(llm)` on this model's inference queue; returns a Future."""
+        return self._entry.inference.submit(job, priority=priority, timeout=timeout)
+
+    def run(self, job, priority=PRIORITY_BACKGROUND, timeout=None):
+        """submit() and wait for the result."""
+        return self.submit(job, priority=priority, timeout=timeout).result()
+
+    def queue_stats(self):
+        return self._entry.inference.stats()
+
+    @contextmanager
+    def locked(self):
+        with self._entry.lock:
+            yield self._entry.load()
+
+    def is_loaded(self):
+        return self._entry.model is not None
+
+    def warm_up(self):
+        with self._entry.lock:
+            self._entry.load()
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._registry._release(self.key)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of models keyed by (model path, n_ctx, n_threads, instance), so
+    agents that use the same GGUF file share one copy of its weights. Acquiring
+    a handle is cheap; the weights load on first use. A model is dropped when
+    its last handle is released.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model_path, n_ctx=2048, n_threads=8, instance=0):
+        # `instance` > 0 asks for a separate copy, e.g. to run jobs in parallel.
+        key = (os.path.normpath(model_path), n_ctx, n_threads, instance)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _ModelEntry(model_path, n_ctx, n_threads)
+                self._entries[key] = entry
+            entry.refs += 1
+        return ModelHandle(self, key, entry)
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs <= 0:
+                del self._entries[key]
+                entry.inference.stop()
+
+    def stats(self):
+        with self._lock:
+            return {key: {"refs": entry.refs, "loaded": entry.model is not None, "queue": entry.inference.stats()}
+                    for key, entry in self._entries.items()}
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def acquire_model(model_path, n_ctx=2048, n_threads=8, instance=0):
+    return MODEL_REGISTRY.acquire(model_path, n_ctx=n_ctx, n_threads=n_threads, instance=instance)
+
+
+def warm_up_in_background(*handles):
+    """
+    Call warm_up() on each of the given model handles (or agents) on a daemon
+    thread so the first call doesn't pay for loading.
+    """
+    def run():
+        for handle in handles:
+            try:
+                handle.warm_up()
+            except Exception as e:
+                print(f"[ModelRegistry] Warm-up failed for {type(handle).__name__}: {e}")
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
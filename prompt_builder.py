@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+
+class PromptSection:
+    """
+    One block of a prompt: an optional header followed by items joined with
+    `separator`. Items are trimmed oldest-first (from the front of the list);
+    a single remaining item that is still too long keeps its end. Sections
+    with a higher priority keep their content longer; required sections are
+    never trimmed.
+    """
+
+    def __init__(self, name, items, priority, budget=None, header="", separator="\n", required=False):
+        self.name = name
+        self.items = [items] if isinstance(items, str) else [item for item in items if item]
+        self.priority = priority
+        self.budget = budget
+        self.header = header
+        self.separator = separator
+        self.required = required
+
+    def render(self):
+        return self.header + self.separator.join(self.items)
+
+
+class PromptBuilder:
+    """
+    Assembles a prompt from sections so that it fits a token budget. Each
+    section is first cut to its own budget; if the whole prompt is still too
+    long, the lowest-priority section gives up content first. Token counts come
+    from the model's tokenizer and are cached per text, so static sections
+    (seed, headers) and memory entries repeated across turns are only
+    tokenized once.
+    """
+
+    def __init__(self, tokenizer, max_tokens, margin=16, cache_size=2048):
+        self.tokenizer = tokenizer  # anything with tokenize(text) -> list and detokenize(tokens) -> str
+        self.max_tokens = max_tokens
+        self.margin = margin  # slack for tokens merging differently across section boundaries
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()  # builds may run on several threads
+
+    def count(self, text):
+        if not text:
+            return 0
+        with self._lock:
+            n = self._counts.get(text)
+            if n is not None:
+                self._counts.move_to_end(text)
+                return n
+        n = len(self.tokenizer.tokenize(text))
+        with self._lock:
+            self._counts[text] = n
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return n
+
+    def section_tokens(self, section):
+        if not section.items:
+            return 0
+        n = self.count(section.header) + sum(self.count(item) for item in section.items)
+        return n + (len(section.items) - 1) * self.count(section.separator)
+
+    def _truncate(self, text, n_tokens):
+        """Keep roughly the last n_tokens tokens of text."""
+        if n_tokens <= 0:
+            return ""
+        tokens = self.tokenizer.tokenize(text)
+        if len(tokens) <= n_tokens:
+            return text
+        return self.tokenizer.detokenize(tokens[-n_tokens:]).lstrip()
+
+    def _shrink(self, section, limit):
+        """Trim section down to `limit` tokens. Returns its new token count."""
+        used = self.section_tokens(section)
+        while used > limit and len(section.items) > 1:
+            section.items.pop(0)
+            used = self.section_tokens(section)
+        if used > limit and section.items:
+            room = limit - self.count(section.header)
+            text = self._truncate(section.items[0], room)
+            section.items = [text] if text else []
+            used = self.section_tokens(section)
+        return used
+
+    def build(self, sections, joiner="\n\n"):
+        """Return (prompt, {section name: tokens used}) for the given sections, in order."""
+        usage = {}
+        for section in sections:
+            used = self.section_tokens(section)
+            if section.budget is not None and used > section.budget and not section.required:
+                used = self._shrink(section, section.budget)
+            usage[section.name] = used
+
+        joiner_tokens = self.count(joiner)
+        limit = self.max_tokens - self.margin
+        total = sum(usage.values()) + joiner_tokens * max(0, len(sections) - 1)
+        for section in sorted(sections, key=lambda s: s.priority):
+            if total <= limit:
+                break
+            if section.required or not usage[section.name]:
+                continue
+            over = total - limit
+            used = self._shrink(section, max(0, usage[section.name] - over))
+            total -= usage[section.name] - used
+            usage[section.name] = used
+        if total > limit:
+            print(f"[PromptBuilder] Required sections alone need {total} tokens (budget {limit})")
+
+        prompt = joiner.join(section.render() for section in sections if section.items)
+        return prompt, usage
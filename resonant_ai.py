@@ -1,8 +1,389 @@
 import numpy as np
 import math
-import requests
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from memory_agent import MemoryAgent
 
+# Seconds each external feed stays fresh. The moon phase is a daily value, the
+# solar flux is published a few times a day and Kp moves in 3-hour steps.
+COSMIC_FACTOR_TTL = {
+    "moon": 6 * 3600,
+    "solar": 3600,
+    "geomagnetic": 900,
+}
+
+# Feed name -> (url, query params).
+COSMIC_FEEDS = {
+    "moon": ("https://api.open-meteo.com/v1/forecast", {
+        "latitude": 0.0,
+        "longitude": 0.0,
+        "daily": "moon_phase",
+        "timezone": "UTC"
+    }),
+    "solar": ("https://services.swpc.noaa.gov/json/solar-radio-flux.json", None),
+    "geomagnetic": ("https://services.swpc.noaa.gov/products/noaa-planetary-k-index.json", None),
+}
+
+
+class CosmicFactorCache:
+    """
+    Process-wide TTL cache for the external cosmic feeds. Each source has its own
+    time-to-live. When an entry expires the feed is fetched again; if that refresh
+    fails the last good value is served (stale fallback) rather than dropping back
+    to the neutral default. A feed that has never answered is retried at most once
+    per `retry_after` seconds.
+    """
+
+    def __init__(self, ttl=None, retry_after=60):
+        self.ttl = dict(COSMIC_FACTOR_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        self.retry_after = retry_after
+        self._entries = {}  # source -> (value, fetched_at)
+        self._failures = {}  # source -> time of last failed fetch without a stale value
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def _fresh(self, source, now):
+        entry = self._entries.get(source)
+        if entry is not None and (now - entry[1]) < self.ttl.get(source, 0):
+            return entry
+        failed_at = self._failures.get(source)
+        if entry is None and failed_at is not None and (now - failed_at) < self.retry_after:
+            return (None, failed_at)
+        return None
+
+    def get_many(self, sources, fetch_many):
+        """
+        Return {source: value} for every source with a fresh, stale or newly
+        fetched value. All misses are handed to `fetch_many(missing)` in one
+        call, which returns a dict holding only the sources it fetched.
+        """
+        results = {}
+        with self._lock:
+            now = time.time()
+            missing = []
+            for source in sources:
+                entry = self._fresh(source, now)
+                if entry is None:
+                    missing.append(source)
+                    continue
+                self.hits += 1
+                if entry[0] is not None:
+                    results[source] = entry[0]
+        if not missing:
+            return results
+
+        # Serialize refreshes so concurrent callers don't all hit the network.
+        with self._refresh_lock:
+            with self._lock:
+                now = time.time()
+                still_missing = []
+                for source in missing:
+                    entry = self._fresh(source, now)
+                    if entry is None:
+                        still_missing.append(source)
+                        self.misses += 1
+                        continue
+                    self.hits += 1
+                    if entry[0] is not None:
+                        results[source] = entry[0]
+
+            fetched = fetch_many(still_missing) if still_missing else {}
+
+            with self._lock:
+                now = time.time()
+                for source in still_missing:
+                    value = fetched.get(source)
+                    if value is not None:
+                        self._entries[source] = (value, now)
+                        self._failures.pop(source, None)
+                        results[source] = value
+                        continue
+                    stale = self._entries.get(source)
+                    if stale is not None:
+                        self.stale_hits += 1
+                        results[source] = stale[0]
+                    else:
+                        self._failures[source] = now
+        return results
+
+    def snapshot(self, sources):
+        """Return the latest known value of each source, however old, without fetching."""
+        with self._lock:
+            results = {}
+            for source in sources:
+                entry = self._entries.get(source)
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    results[source] = entry[0]
+            return results
+
+    def refresh(self, sources, fetch_many, horizon=0.0):
+        """
+        Fetch the sources that are missing or would expire within `horizon`
+        seconds, and store whatever comes back. Used by CosmicRefresher to keep
+        entries warm ahead of their TTL.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                now = time.time()
+                due = [s for s in sources if self._fresh(s, now + horizon) is None]
+            if not due:
+                return {}
+            fetched = fetch_many(due)
+            with self._lock:
+                now = time.time()
+                for source, value in fetched.items():
+                    if value is not None:
+                        self._entries[source] = (value, now)
+                        self._failures.pop(source, None)
+            return fetched
+
+    def invalidate(self, source=None):
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+                self._failures.clear()
+            else:
+                self._entries.pop(source, None)
+                self._failures.pop(source, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            now = time.time()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "ages": {k: now - v[1] for k, v in self._entries.items()},
+            }
+
+
+class CosmicFeedFetcher:
+    """
+    Fetches the cosmic feeds concurrently over one pooled keep-alive session.
+    All requests of a batch share a single deadline, so a cold fetch costs as
+    long as the slowest feed rather than the sum of all of them.
+    """
+
+    def __init__(self, timeout=5.0, urls=None, max_workers=3):
+        self.timeout = timeout
+        self.feeds = dict(COSMIC_FEEDS)
+        for name, url in (urls or {}).items():
+            self.feeds[name] = (url, self.feeds.get(name, (None, None))[1])
+        self.max_workers = max_workers
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                # requests is imported on first fetch so agents that only read a
+                # warm cache (or run offline sources) never pay for it.
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=len(self.feeds), pool_maxsize=self.max_workers)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="cosmic-feed")
+            return self._session
+
+    def _get_json(self, name, deadline):
+        url, params = self.feeds[name]
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError("deadline exceeded before request started")
+        r = self._get_session().get(url, params=params, timeout=remaining)
+        if not r.ok:
+            raise IOError(f"HTTP {r.status_code}")
+        return r.json()
+
+    def fetch_json(self, names):
+        """Return {name: parsed JSON} for every feed that answered before the deadline."""
+        self._get_session()
+        deadline = time.time() + self.timeout
+        futures = {self._executor.submit(self._get_json, name, deadline): name for name in names}
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        results = {}
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"[CosmicFeed] {name} error: {e}")
+        for future in not_done:
+            print(f"[CosmicFeed] {futures[future]} timed out after {self.timeout}s")
+        return results
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class JsonFixtureSource:
+    """
+    Offline stand-in for CosmicFeedFetcher. Reads a JSON file mapping feed names
+    ("moon", "solar", "geomagnetic") to payloads shaped like the live APIs. The
+    file is re-read on every fetch so it can be edited while an agent runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch_json(self, names):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"[CosmicFeed] Fixture {self.path} error: {e}")
+            return {}
+        return {name: data[name] for name in names if name in data}
+
+
+class CosmicRefresher:
+    """
+    Daemon thread that keeps the cosmic cache warm. Every `interval` seconds it
+    refetches any feed that would expire before the next tick, so readers can
+    serve the latest snapshot without touching the network.
+    """
+
+    def __init__(self, cache, fetch_many, sources, interval=60.0):
+        self.cache = cache
+        self.fetch_many = fetch_many
+        self.sources = list(sources)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cosmic-refresher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.cache.refresh(self.sources, self.fetch_many, horizon=self.interval)
+            except Exception as e:
+                print(f"[CosmicRefresher] Error: {e}")
+            self._ready.set()
+            self._stop_event.wait(self.interval)
+
+    def wait_ready(self, timeout=None):
+        """Block until the first refresh pass has finished."""
+        return self._ready.wait(timeout)
+
+    def is_running(self):
+        return self._thread.is_alive() and not self._stop_event.is_set()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+
+# Per-cycle record returned by the batch APIs.
+CYCLE_DTYPE = np.dtype([
+    ("score", np.float64),
+    ("resonance", np.bool_),
+    ("sacred_moment", np.bool_),
+])
+
+
+def cosmic_patience_from(factors):
+    # Only multiply numeric factors for patience calculation
+    return float(np.prod([factors["moon"], factors["solar"], factors["geomagnetic"], factors["fatigue"]]))
+
+
+def _resonance_step(states, cosmic_vector, thresholds, patience):
+    """
+    Advance every row of the (agents x 4) `states` matrix by one cycle, in place,
+    and return a CYCLE_DTYPE array with one record per agent.
+    """
+    scores = states @ cosmic_vector
+    resonant = scores > thresholds
+
+    safe_patience = patience if patience > 0 else 0.01
+    blended = np.where(
+        resonant[:, None],
+        (states + cosmic_vector) / 2,
+        states + (0.01 / safe_patience) * cosmic_vector
+    )
+    states[:] = blended / np.linalg.norm(blended, axis=1, keepdims=True)
+
+    out = np.empty(len(scores), dtype=CYCLE_DTYPE)
+    out["score"] = scores
+    out["resonance"] = resonant
+    out["sacred_moment"] = resonant & (scores > 0.99) & (patience > 1.3)
+    return out
+
+
+class ResonantPopulation:
+    """
+    Many resonant agents simulated together as one (agents x 4) state matrix.
+    Scoring, thresholding, blending and renormalization run as single NumPy
+    operations over all agents, which makes threshold and population sweeps
+    cheap. Populations keep no memory bank and do no logging.
+    """
+
+    def __init__(self, n_agents, thresholds=0.95, factor_provider=None, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (n_agents,)).copy()
+        self.factor_provider = factor_provider
+        self.states = self._init_states(n_agents)
+
+    def _init_states(self, n_agents):
+        states = self.rng.random((n_agents, 4))
+        return states / np.linalg.norm(states, axis=1, keepdims=True)
+
+    def reset_states(self):
+        self.states = self._init_states(len(self.states))
+
+    def run_cycles(self, n_cycles, factors=None):
+        """
+        Run `n_cycles` cycles for every agent. Returns a CYCLE_DTYPE array of
+        shape (n_cycles, n_agents). `factors` defaults to one call of the
+        factor provider for the whole run.
+        """
+        if factors is None:
+            if self.factor_provider is None:
+                raise ValueError("ResonantPopulation needs cosmic factors or a factor_provider")
+            factors = self.factor_provider()
+        patience = cosmic_patience_from(factors)
+        vec = np.array([factors["moon"], factors["solar"], factors["geomagnetic"], factors["fatigue"]])
+        cosmic_vector = vec / np.linalg.norm(vec)
+
+        results = np.empty((n_cycles, len(self.states)), dtype=CYCLE_DTYPE)
+        for i in range(n_cycles):
+            results[i] = _resonance_step(self.states, cosmic_vector, self.thresholds, patience)
+        return results
+
+
+# Shared by every ResonantAgent in the process.
+COSMIC_CACHE = CosmicFactorCache()
+COSMIC_FETCHER = CosmicFeedFetcher()
+
+
 class ResonantAgent:
     """
     ResonantAgent evaluates the vibrational alignment of symbolic actions or states
@@ -11,8 +392,11 @@ class ResonantAgent:
     state vector to evolve symbolic awareness over time.
     """
 
-    def __init__(self, threshold=0.95, decay=0.005):
+    def __init__(self, threshold=0.95, decay=0.005, cosmic_cache=None, fetcher=None):
         self.threshold = threshold
+        self.cosmic_cache = cosmic_cache or COSMIC_CACHE
+        self.fetcher = fetcher or COSMIC_FETCHER
+        self._refresher = None
         self.memory = MemoryAgent(capacity=100, decay_rate=decay)
         self.state_vector = self._init_state()
         self.threshold_min = 0.7
@@ -31,32 +415,80 @@ class ResonantAgent:
         return weight * np.dot(self.state_vector, vector)
 
     def get_moon_phase_factor(self):
+        phase = self._cached_factors(["moon"]).get("moon")
+        return 0.55 if phase is None else phase  # fallback neutral value around mid range
+
+    def get_solar_activity_factor(self):
+        solar = self._cached_factors(["solar"]).get("solar")
+        return (1.0, "UNKNOWN") if solar is None else solar
+
+    def get_geomagnetic_factor(self):
+        geo = self._cached_factors(["geomagnetic"]).get("geomagnetic")
+        return (1.0, 0.0) if geo is None else geo
+
+    def _cached_factors(self, sources):
+        # With a background refresher running, never block on the network.
+        if self._refresher is not None and self._refresher.is_running():
+            return self.cosmic_cache.snapshot(sources)
+        return self.cosmic_cache.get_many(sources, self._fetch_cosmic_factors)
+
+    def start_background_refresh(self, interval=60.0, source=None, wait=False):
+        """
+        Keep the moon, solar and geomagnetic factors warm from a daemon thread.
+        `source` replaces the fetcher (e.g. JsonFixtureSource or a
+        CosmicFeedFetcher pointed at a local server). Until the first refresh
+        lands, cycles use the neutral fallback values; pass wait=True to block
+        for it instead.
+        """
+        self.stop_background_refresh()
+        if source is not None:
+            self.fetcher = source
+        self._refresher = CosmicRefresher(
+            self.cosmic_cache,
+            self._fetch_cosmic_factors,
+            ["moon", "solar", "geomagnetic"],
+            interval=interval
+        ).start()
+        if wait:
+            self._refresher.wait_ready(getattr(self.fetcher, "timeout", None))
+        return self._refresher
+
+    def stop_background_refresh(self):
+        if self._refresher is not None:
+            self._refresher.stop(timeout=1)
+            self._refresher = None
+
+    def _fetch_cosmic_factors(self, sources):
+        """Fetch the given feeds in parallel and parse each payload once."""
+        parsers = {
+            "moon": self._parse_moon_phase,
+            "solar": self._parse_solar_activity,
+            "geomagnetic": self._parse_geomagnetic,
+        }
+        payloads = self.fetcher.fetch_json(sources)
+        factors = {}
+        for name, data in payloads.items():
+            value = parsers[name](data)
+            if value is not None:
+                factors[name] = value
+        return factors
+
+    def _parse_moon_phase(self, data):
         try:
-            r = requests.get("https://api.open-meteo.com/v1/forecast", params={
-                "latitude": 0.0,
-                "longitude": 0.0,
-                "daily": "moon_phase",
-                "timezone": "UTC"
-            }, timeout=5)
-
-            if r.ok:
-                phase_list = r.json().get("daily", {}).get("moon_phase", [])
-                if phase_list:
-                    phase = phase_list[0]  # raw 0 to 1
-                    scaled_phase = 0.1 + 0.9 * phase  # scale 0-1 to 0.1-1.0
-                    if self.debug:
-                        print(f"[MoonPhase] Raw: {phase:.3f}, Scaled: {scaled_phase:.3f}")
-                    return scaled_phase
+            phase_list = data.get("daily", {}).get("moon_phase", [])
+            if phase_list:
+                phase = phase_list[0]  # raw 0 to 1
+                scaled_phase = 0.1 + 0.9 * phase  # scale 0-1 to 0.1-1.0
+                if self.debug:
+                    print(f"[MoonPhase] Raw: {phase:.3f}, Scaled: {scaled_phase:.3f}")
+                return scaled_phase
         except Exception as e:
             print(f"[MoonPhase] Error: {e}")
-        return 0.55  # fallback neutral value around mid range
+        return None
 
-    def get_solar_activity_factor(self):
+    def _parse_solar_activity(self, data):
         try:
-            r = requests.get("https://services.swpc.noaa.gov/json/solar-radio-flux.json", timeout=5)
-            if r.ok and isinstance(r.json(), list) and len(r.json()) > 0:
-                data = r.json()
-
+            if isinstance(data, list) and len(data) > 0:
                 target_freq = 2800  # MHz (approximate F10.7 frequency)
                 flux_values = []
 
@@ -89,22 +521,20 @@ class ResonantAgent:
         except Exception as e:
             print(f"[SolarRadioFlux] Error: {e}")
 
-        return 1.0, "UNKNOWN"
-
+        return None
 
-    def get_geomagnetic_factor(self):
+    def _parse_geomagnetic(self, data):
         try:
-            r = requests.get("https://services.swpc.noaa.gov/products/noaa-planetary-k-index.json", timeout=5)
-            if r.ok and isinstance(r.json(), list):
-                data = r.json()[-1]
-                kp = float(data[1])
+            if isinstance(data, list):
+                latest = data[-1]
+                kp = float(latest[1])
                 kp_normalized = min(kp, 9.0) / 9.0
                 factor = 1.0 - 0.9 * kp_normalized
                 factor = max(factor, 0.1)
                 return factor, kp
         except:
             pass
-        return 1.0, 0.0
+        return None
 
     def weighted_success_failure_ratio(self, window_seconds=300):
         return 0.0  # Neutral ratio (no success or failure bias)
@@ -118,40 +548,57 @@ class ResonantAgent:
         return sum(adjustments) / 3
 
     def run_cycle(self):
+        # Fetch once and derive both the patience and the cosmic vector from it.
         factors = self.get_cosmic_factors()
+        cosmic_patience = cosmic_patience_from(factors)
+        cosmic_vector = self.generate_cosmic_vectors(factors)
 
-        # Only multiply numeric factors for patience calculation
-        numeric_factors = [factors["moon"], factors["solar"], factors["geomagnetic"], factors["fatigue"]]
-        cosmic_patience = np.prod(numeric_factors)
-
-        cosmic_vector = self.generate_cosmic_vectors()
-        score = self.resonance_score(cosmic_vector)
+        states = self.state_vector.reshape(1, -1)
+        cycle = _resonance_step(states, cosmic_vector, np.array([self.threshold]), cosmic_patience)[0]
+        self.state_vector = states[0]
 
         result = {
-            "score": score,
+            "score": cycle["score"],
             "patience": cosmic_patience,
-            "resonance": False,
+            "resonance": bool(cycle["resonance"]),
             "threshold": self.threshold,
-            "sacred_moment": False
+            "sacred_moment": bool(cycle["sacred_moment"]),
+            "factors": factors
         }
 
-        if score > self.threshold:
-            self.state_vector = (self.state_vector + cosmic_vector) / 2
-            self.state_vector /= np.linalg.norm(self.state_vector)
-            self.memory.store_memory(self.state_vector)
-            result["resonance"] = True
-            if score > 0.99 and cosmic_patience > 1.3:
-                result["sacred_moment"] = True
-        else:
-            safe_patience = cosmic_patience if cosmic_patience > 0 else 0.01
-            self.state_vector += (0.01 / safe_patience) * cosmic_vector
-            self.state_vector /= np.linalg.norm(self.state_vector)
+        if result["resonance"]:
+            self.memory.store_memory(self.state_vector.copy())
 
         if self.debug:
-            print(f"[CycleLog] Score: {score:.3f} | Threshold: {self.threshold:.3f} | Patience: {cosmic_patience:.3f} | Resonant: {result['resonance']} | Sacred: {result['sacred_moment']}")
+            print(f"[CycleLog] Score: {result['score']:.3f} | Threshold: {self.threshold:.3f} | Patience: {cosmic_patience:.3f} | Resonant: {result['resonance']} | Sacred: {result['sacred_moment']}")
 
         return result
 
+    def run_cycles(self, n, factors=None):
+        """
+        Run `n` cycles without per-cycle logging and return a CYCLE_DTYPE array
+        of length `n`. Cosmic factors are looked up once for the whole run.
+        """
+        factors = factors or self.get_cosmic_factors()
+        cosmic_patience = cosmic_patience_from(factors)
+        cosmic_vector = self.generate_cosmic_vectors(factors)
+        thresholds = np.array([self.threshold])
+
+        states = self.state_vector.reshape(1, -1)
+        results = np.empty(n, dtype=CYCLE_DTYPE)
+        for i in range(n):
+            results[i] = _resonance_step(states, cosmic_vector, thresholds, cosmic_patience)[0]
+            if results[i]["resonance"]:
+                self.memory.store_memory(states[0].copy())
+        self.state_vector = states[0]
+        return results
+
+    def spawn_population(self, n_agents, thresholds=None):
+        """Create a ResonantPopulation that shares this agent's cosmic factor source."""
+        if thresholds is None:
+            thresholds = self.threshold
+        return ResonantPopulation(n_agents, thresholds=thresholds, factor_provider=self.get_cosmic_factors)
+
     def get_threshold(self):
         return self.threshold
 
@@ -165,12 +612,14 @@ class ResonantAgent:
         return self.memory.average_memory()
 
     def get_cosmic_factors(self):
-        moon = self.get_moon_phase_factor()
+        # One cache lookup for all feeds; misses are fetched together in parallel.
+        cached = self._cached_factors(["moon", "solar", "geomagnetic"])
+        moon = cached.get("moon", 0.55)
 
         # Get detailed solar activity from solar radio flux data
-        solar_factor, solar_level = self.get_solar_activity_factor()
+        solar_factor, solar_level = cached.get("solar", (1.0, "UNKNOWN"))
 
-        geo_factor, kp = self.get_geomagnetic_factor()
+        geo_factor, kp = cached.get("geomagnetic", (1.0, 0.0))
         fatigue = self.get_fatigue_factor()
 
         # Clamp moon factor to [0.1, 1.0]
@@ -194,8 +643,12 @@ class ResonantAgent:
             "fatigue": fatigue
         }
 
-    def generate_cosmic_vectors(self):
-        factors = self.get_cosmic_factors()
+    def cosmic_cache_stats(self):
+        """Hit/miss counters of the shared cosmic factor cache."""
+        return self.cosmic_cache.stats()
+
+    def generate_cosmic_vectors(self, factors=None):
+        factors = factors or self.get_cosmic_factors()
         vec = np.array([
             factors["moon"],
             factors["solar"],
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import threading
+import time
+import weakref
+
+
+class ScheduledJob:
+    """A periodic job registered with a Scheduler. Bound methods are held weakly."""
+
+    def __init__(self, scheduler, fn, interval, name=None, on_shutdown=None):
+        self._scheduler = scheduler
+        self._ref = self._weak(fn)
+        self._shutdown_ref = self._weak(on_shutdown or fn)
+        self.interval = interval
+        self.name = name or getattr(fn, "__qualname__", repr(fn))
+        self.cancelled = False
+
+    @staticmethod
+    def _weak(fn):
+        # A bound method would keep its agent alive forever; hold it weakly.
+        return weakref.WeakMethod(fn) if hasattr(fn, "__self__") else (lambda: fn)
+
+    def _target(self):
+        return None if self.cancelled else self._ref()
+
+    def cancel(self):
+        self.cancelled = True
+        self._scheduler._wake()
+
+    def run_final(self):
+        fn = None if self.cancelled else self._shutdown_ref()
+        if fn is not None:
+            fn()
+
+
+class Scheduler:
+    """
+    One timer thread for every periodic job in the process (text-log batch
+    flushes, journal fsyncs, ...). Jobs live in a heap ordered by their next
+    deadline, so the thread sleeps until exactly the next one is due, and the
+    number of threads stays constant however many agents register jobs.
+    Jobs should be short; a slow job delays the ones behind it.
+    """
+
+    def __init__(self):
+        self._heap = []  # (deadline, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def schedule(self, fn, interval, delay=None, name=None, on_shutdown=None):
+        """
+        Run `fn` every `interval` seconds, first after `delay` (default: interval).
+        `on_shutdown` (default: fn) runs once when the scheduler shuts down.
+        """
+        job = ScheduledJob(self, fn, interval, name, on_shutdown)
+        with self._cond:
+            heapq.heappush(self._heap, (time.time() + (interval if delay is None else delay), next(self._seq), job))
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                        continue
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+
+            fn = job._target()
+            if fn is None:
+                continue  # cancelled, or its owner was garbage collected
+            try:
+                fn()
+            except Exception as e:
+                print(f"[Scheduler] Job {job.name} failed: {e}")
+
+            with self._cond:
+                if not job.cancelled:
+                    heapq.heappush(self._heap, (time.time() + job.interval, next(self._seq), job))
+
+    def jobs(self):
+        with self._cond:
+            return [job for _, _, job in self._heap if job._target() is not None]
+
+    def shutdown(self, run_pending=True, timeout=5):
+        """
+        Stop the timer thread. With run_pending, every live job's shutdown
+        callback runs once so nothing buffered is left behind.
+        """
+        with self._cond:
+            self._running = False
+            jobs = [job for _, _, job in self._heap]
+            self._heap = []
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        if run_pending:
+            for job in jobs:
+                try:
+                    job.run_final()
+                except Exception as e:
+                    print(f"[Scheduler] Job {job.name} failed during shutdown: {e}")
+
+
+_SCHEDULER = Scheduler()
+
+
+def get_scheduler():
+    return _SCHEDULER
@@ -0,0 +1,76 @@
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_agent import MemoryAgent
+
+
+class _NoSummary:
+    def summarize(self, text):
+        return "summary"
+
+
+def _agent(storage_dir, compact_every=8):
+    return MemoryAgent(
+        storage_dir=str(storage_dir),
+        decay_rate=0.5,
+        persistence="journal",
+        journal_options={"compact_every": compact_every},
+        summarizer=_NoSummary(),
+    )
+
+
+def _state(agent):
+    rows = []
+    for item in agent.memory_bank:
+        d = item.to_dict()
+        d.pop("weight_at")
+        d["weight"] = round(d["weight"], 9)
+        rows.append(d)
+    return rows
+
+
+def _exercise(agent):
+    for i in range(6):
+        agent.store_memory(f"note {i}", data_type="generic", weight=1.0 if i % 2 else 0.015)
+    first = agent.memory_bank[0].id
+    agent.mark_memory_important(first)
+    agent.enrich_metadata(agent.memory_bank[1].id, {"source": "test"})
+    agent.decay_memory()  # drops the light items
+    agent.store_memory("after decay", data_type="generic")
+    agent.unmark_memory_important(first)
+    agent.memory_bank[-1].weight = 0.25
+
+
+def test_round_trip_across_compaction(tmp_path):
+    agent = _agent(tmp_path)
+    _exercise(agent)
+    assert agent.journal.generation > 0  # the run crossed at least one compaction
+    expected = _state(agent)
+    agent.close()
+
+    reloaded = _agent(tmp_path)
+    reloaded.load_index()
+    assert _state(reloaded) == expected
+    reloaded.close()
+
+
+def test_crash_between_snapshot_and_truncate(tmp_path):
+    agent = _agent(tmp_path, compact_every=1000)
+    _exercise(agent)
+    agent.journal.sync()
+    stale_journal = tmp_path / "stale.jsonl"
+    shutil.copy(agent.journal.journal_path, stale_journal)
+    agent.journal.write_snapshot([item.to_dict() for item in agent.memory_bank])
+    expected = _state(agent)
+    agent.close()
+    # As if the process died after the snapshot was replaced but before the
+    # journal was truncated.
+    shutil.copy(stale_journal, agent.journal.journal_path)
+
+    reloaded = _agent(tmp_path, compact_every=1000)
+    reloaded.load_index()
+    assert _state(reloaded) == expected
+    reloaded.close()
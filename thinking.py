@@ -1,47 +1,241 @@
-from llama_cpp import Llama
 from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import queue
+import threading
 import time
+from model_registry import acquire_model, PRIORITY_MONOLOGUE, PRIORITY_BACKGROUND
 
 class TinyLlamaSummarizer:
-    def __init__(self, model_path, max_tokens=512, n_threads=8):
-        self.llm = Llama(model_path=model_path, n_ctx=2048, n_threads=n_threads)
+    """
+    Summarizes text of any length within the model's context. Text that does
+    not fit one prompt is split on line boundaries into token-sized chunks;
+    the chunks are summarized (map) and the partial summaries are summarized
+    again, level by level, until one remains (reduce). With n_workers > 1 the
+    map runs on that many model instances, n_threads split between them.
+    A summary finishes within `time_budget` seconds: chunks still pending at
+    the deadline are dropped and whatever was summarized is returned.
+    """
+
+    PROMPT = "Summarize the following text briefly:\n\n{text}\n\nSummary:"
+    REDUCE_PROMPT = "Combine these partial summaries into one brief summary:\n\n{text}\n\nSummary:"
+
+    def __init__(self, model_path, max_tokens=512, n_threads=8, n_ctx=2048, n_workers=1, time_budget=120.0):
+        threads_each = max(1, n_threads // n_workers)
+        self.workers = [
+            acquire_model(model_path, n_ctx=n_ctx, n_threads=threads_each, instance=i) for i in range(n_workers)
+        ]
+        self.llm = self.workers[0]
         self.max_tokens = max_tokens
+        self.n_ctx = n_ctx
+        self.time_budget = time_budget
+
+    def close(self):
+        for worker in self.workers:
+            worker.release()
+
+    def _split(self, text):
+        """Pack the lines of text into chunks that fit a prompt, cutting over-long lines by tokens."""
+        chunks = []
+        current, used = [], 0
+        with self.llm.locked() as llm:
+            template = max(self.PROMPT, self.REDUCE_PROMPT, key=len).format(text="")
+            budget = self.n_ctx - self.max_tokens - len(llm.tokenize(template.encode("utf-8"))) - 8
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                tokens = llm.tokenize(line.encode("utf-8"), add_bos=False)
+                n = len(tokens) + 1  # + newline
+                if used + n > budget and current:
+                    chunks.append("\n".join(current))
+                    current, used = [], 0
+                if n > budget:
+                    for i in range(0, len(tokens), budget):
+                        chunks.append(llm.detokenize(tokens[i:i + budget]).decode("utf-8", errors="ignore"))
+                    continue
+                current.append(line)
+                used += n
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _summarize_chunks(self, template, chunks, deadline):
+        """
+        Summarize each chunk in order. Only about two chunks per worker are
+        queued at a time, the next going in as each finishes, so a big batch
+        never fills the model's shared queue ahead of the monologue.
+        """
+        window = 2 * len(self.workers)
+        pending = deque()
+        next_chunk = 0
+        summaries = []
+        while pending or next_chunk < len(chunks):
+            while next_chunk < len(chunks) and len(pending) < window and time.time() < deadline:
+                prompt = template.format(text=chunks[next_chunk])
+                # Summaries are background work: queued behind chat and the monologue.
+                pending.append(self.workers[next_chunk % len(self.workers)].submit(
+                    lambda llm, prompt=prompt: llm(prompt, max_tokens=self.max_tokens, stop=["\n"]),
+                    priority=PRIORITY_BACKGROUND
+                ))
+                next_chunk += 1
+            if not pending:
+                break  # out of time before the rest were queued
+            future = pending.popleft()
+            try:
+                output = future.result(timeout=max(0.0, deadline - time.time()))
+            except FutureTimeout:
+                future.cancel()  # not started yet: skipped by the queue
+                continue
+            except Exception as e:
+                print(f"[TinyLlamaSummarizer] Chunk failed: {e}")
+                continue
+            summary = output['choices'][0]['text'].strip()
+            if summary:
+                summaries.append(summary)
+        return summaries
 
     def summarize(self, text):
+        """
+        Summary of `text`, map-reduced over chunks when it is long. Chunks run
+        in parallel only when the summarizer was built with n_workers > 1; the
+        default (and MemoryAgent's default summarizer) uses one model instance,
+        so chunks are summarized one after another.
+        """
         if not text.strip():
             return ""
-        prompt = f"Summarize the following text briefly:\n\n{text}\n\nSummary:"
-        output = self.llm(prompt, max_tokens=self.max_tokens, stop=["\n"])
-        summary = output['choices'][0]['text'].strip()
-        return summary
+        deadline = time.time() + self.time_budget
+        chunks = self._split(text)
+        template = self.PROMPT
+        while True:
+            summaries = self._summarize_chunks(template, chunks, deadline)
+            if len(summaries) <= 1 or time.time() >= deadline:
+                return " ".join(summaries)
+            next_chunks = self._split("\n".join(summaries))
+            if len(next_chunks) >= len(chunks):
+                # Summaries are not getting shorter; stop rather than loop.
+                return " ".join(summaries)
+            chunks, template = next_chunks, self.REDUCE_PROMPT
+
+
+class SummarizationWorker:
+    """
+    Single background thread that runs summarization jobs from a bounded queue,
+    so callers such as MemoryAgent.decay_memory never wait on the LLM. Each
+    submitted job gets a Future that resolves to whatever the job returns.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, maxsize=32):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="summarizer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide worker; summarization is serialized on the model anyway."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def submit(self, job):
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(job())
+            except Exception as e:
+                print(f"[SummarizationWorker] Error: {e}")
+                future.set_exception(e)
 
 
 class InnerMonologueAgent:
-    def __init__(self, model_path, max_tokens=512, n_threads=8):
+    def __init__(self, model_path, max_tokens=512, n_threads=8, n_ctx=2048):
         print("[DEBUG] InnerMonologueAgent initialized")
-        self.llm = Llama(model_path=model_path, n_ctx=2048, n_threads=n_threads)
+        self.llm = acquire_model(model_path, n_ctx=n_ctx, n_threads=n_threads)
         self.max_tokens = max_tokens
-        self.monologue_memory = deque(maxlen=20)
+        self.n_ctx = n_ctx
+        self.monologue_memory = deque()  # bounded by the token budget, see _evict_to_fit
+        self._turn_tokens = []  # tokens of each monologue_memory entry, as fed to the model
+
+    def close(self):
+        self.llm.release()
+
+    def _context_budget(self):
+        # Room left for the turns once the generated reply and the "AI:" cue fit.
+        return self.n_ctx - self.max_tokens - 8
+
+    def _append_turn(self, llm, text):
+        first = not self._turn_tokens
+        tokens = llm.tokenize((text if first else "\n" + text).encode("utf-8"), add_bos=first)
+        self.monologue_memory.append(text)
+        self._turn_tokens.append(tokens)
+
+    def _evict_to_fit(self):
+        """
+        Drop the oldest AI turns (the opening User turn stays) until the
+        context fits. Evicting changes the prompt prefix, so the model has to
+        re-evaluate what follows; dropping down to 3/4 of the budget at once
+        keeps that from happening every cycle.
+        """
+        budget = self._context_budget()
+        used = sum(len(t) for t in self._turn_tokens)
+        if used <= budget:
+            return
+        target = budget * 3 // 4
+        while len(self._turn_tokens) > 2 and used > target:
+            used -= len(self._turn_tokens.pop(1))
+            del self.monologue_memory[1]
+        if used > budget:
+            # The opening turn alone is too long: keep BOS and its most recent tokens.
+            first = self._turn_tokens[0]
+            excess = used - target
+            self._turn_tokens[0] = first[:1] + first[1 + excess:]
 
     def think(self, initial_input, max_cycles=5, timeout=15):
+        """
+        Run up to `max_cycles` AI turns on `initial_input`. The context is kept
+        as token lists and only grows at the end, so llama.cpp reuses its KV
+        cache and each cycle evaluates just the newly added text rather than
+        the whole monologue again.
+        """
         print("[DEBUG] InnerMonologueAgent.think() was triggered")
         self.monologue_memory.clear()
-        self.monologue_memory.append(f"User: {initial_input}")
+        self._turn_tokens = []
 
         cycle = 0
         start_time = time.time()
         last_response = None
 
+        with self.llm.locked() as llm:
+            self._append_turn(llm, f"User: {initial_input}")
+            cue = llm.tokenize(b"\nAI:", add_bos=False)
+
         while cycle < max_cycles and (time.time() - start_time) < timeout:
-            prompt = "\n".join(self.monologue_memory) + "\nAI:"
-            output = self.llm(prompt, max_tokens=self.max_tokens, stop=["User:", "AI:"])
-            response = output['choices'][0]['text'].strip()
+            self._evict_to_fit()
+            prompt = [token for tokens in self._turn_tokens for token in tokens] + cue
+
+            def step(llm):
+                output = llm(prompt, max_tokens=self.max_tokens, stop=["User:", "AI:"])
+                response = output['choices'][0]['text'].strip()
+                self._append_turn(llm, f"AI: {response}")
+                return response
 
-            self.monologue_memory.append(f"AI: {response}")
+            response = self.llm.run(step, priority=PRIORITY_MONOLOGUE)
             last_response = response
             cycle += 1
 
             if "FINAL DECISION" in response.upper():
                 break
 
-        return last_response
\ No newline at end of file
+        return last_response
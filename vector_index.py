@@ -0,0 +1,162 @@
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Contiguous float32 embedding matrix for similarity search over memories.
+    Rows are added as memories are stored and swap-removed when they are
+    evicted, so the matrix stays dense and search is one matrix product plus
+    a partial sort. All vectors must share the dimension of the first one
+    added; others are skipped.
+
+    Search is exact by default. With `approximate_threshold` set, once the
+    index holds that many vectors of at least `min_dim` dimensions it also
+    builds an inverted-file (IVF) index: vectors are bucketed by their nearest
+    k-means centroid and a query only scores the closest buckets, `n_probe` of
+    them or by default a quarter of all buckets. IVF only pays off for large,
+    well-clustered embedding sets with a small n_probe; low-dimensional vectors
+    (such as the 4-d state vectors) are always searched exactly.
+    """
+
+    def __init__(self, initial_size=1024, approximate_threshold=None, n_probe=None, min_dim=32):
+        self.dim = None
+        self.approximate_threshold = approximate_threshold
+        self.n_probe = n_probe
+        self.min_dim = min_dim
+        self._initial_size = initial_size
+        self._matrix = None
+        self._ids = []  # row -> memory id
+        self._rows = {}  # memory id -> row
+        self._ivf = None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def clear(self):
+        self.dim = None
+        self._matrix = None
+        self._ids = []
+        self._rows = {}
+        self._ivf = None
+
+    def add(self, memory_id, vector):
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        if self.dim is None:
+            self.dim = vec.size
+            self._matrix = np.empty((self._initial_size, self.dim), dtype=np.float32)
+        if vec.size != self.dim or memory_id in self._rows:
+            return False
+        row = len(self._ids)
+        if row == len(self._matrix):
+            grown = np.empty((2 * len(self._matrix), self.dim), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+        self._matrix[row] = vec
+        self._ids.append(memory_id)
+        self._rows[memory_id] = row
+
+        if self._ivf is not None:
+            self._ivf.add(row, vec)
+            if len(self._ids) >= 2 * self._ivf.trained_size:
+                self._train_ivf()
+        elif (self.approximate_threshold is not None and len(self._ids) >= self.approximate_threshold
+              and self.dim >= self.min_dim):
+            self._train_ivf()
+        return True
+
+    def remove(self, memory_id):
+        row = self._rows.pop(memory_id, None)
+        if row is None:
+            return False
+        last = len(self._ids) - 1
+        if row != last:
+            # Keep the matrix dense: move the last row into the hole.
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+            if self._ivf is not None:
+                self._ivf.move(last, row)
+        self._ids.pop()
+        return True
+
+    def search(self, query, k=5):
+        """Top-k (memory_id, score) pairs by dot product, best first."""
+        return self.search_batch(np.asarray(query, dtype=np.float32).reshape(1, -1), k)[0]
+
+    def search_batch(self, queries, k=5):
+        """Top-k (memory_id, score) pairs for each row of `queries`."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), -1)
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+
+        if self._ivf is None:
+            return [self._top_k(None, scores, k) for scores in queries @ self._matrix[:n].T]
+        n_probe = self.n_probe or max(8, self._ivf.n_lists // 4)
+        results = []
+        for query in queries:
+            rows = self._ivf.candidates(query, n_probe, n)
+            results.append(self._top_k(rows, self._matrix[rows] @ query, k))
+        return results
+
+    def _top_k(self, rows, scores, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(self._ids[rows[i]], float(scores[i])) for i in top]
+        return [(self._ids[i], float(scores[i])) for i in top]
+
+    def _train_ivf(self):
+        n = len(self._ids)
+        self._ivf = _IVFLists(self._matrix[:n], n_lists=max(1, int(np.sqrt(n))))
+
+
+class _IVFLists:
+    """Coarse k-means quantizer; each row is labelled with its nearest centroid's list."""
+
+    def __init__(self, matrix, n_lists, iterations=8, sample_size=20000, seed=0):
+        rng = np.random.default_rng(seed)
+        n = len(matrix)
+        sample = matrix[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            labels = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=len(centroids))
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        self.centroids = centroids
+        self._half_norms = 0.5 * np.sum(centroids * centroids, axis=1)
+        self.trained_size = n
+        # row -> list (centroid) number; rows past the index's length are stale.
+        self.labels = self._nearest(matrix, centroids).astype(np.int32)
+
+    @staticmethod
+    def _nearest(vectors, centroids):
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids * centroids, axis=1), axis=1)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def add(self, row, vec):
+        if row >= len(self.labels):
+            self.labels = np.concatenate([self.labels, np.empty(max(row + 1, len(self.labels)), np.int32)])
+        self.labels[row] = int(np.argmax(self.centroids @ vec - self._half_norms))
+
+    def move(self, old_row, new_row):
+        self.labels[new_row] = self.labels[old_row]
+
+    def candidates(self, query, n_probe, n):
+        """Rows (among the first n) in the n_probe lists whose centroids score best against query."""
+        probe = np.zeros(len(self.centroids), dtype=np.bool_)
+        probe[np.argsort(-(self.centroids @ query))[:n_probe]] = True
+        return np.flatnonzero(probe[self.labels[:n]])
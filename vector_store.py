@@ -0,0 +1,107 @@
+import os
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Several agents in one process may share a sidecar path, so appends are
+# serialised per path here and across processes with a lock file.
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(path):
+    with _path_locks_guard:
+        return _path_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+class _FileLock:
+    """Exclusive advisory lock on `<path>.lock`, held across an append."""
+
+    def __init__(self, path):
+        self._file = open(path + ".lock", "a+b")
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def close(self):
+        self._file.close()
+
+
+class VectorStore:
+    """
+    Append-only float32 sidecar for ndarray memory payloads. Each vector is
+    written once as raw float32 bytes and referred to by a small dict
+    ({"offset": ..., "shape": [...]}, offset in elements) that goes into the
+    JSON index instead of the numbers themselves. Reads are zero-copy views
+    into a read-only memory map of the file.
+
+    Payloads are stored as float32 whatever their original dtype. Space held by
+    vectors whose memories were evicted is not reclaimed. Offsets come from
+    the real end of the file under a per-path lock (threads) and a lock file
+    (processes), so stores sharing a path never hand out the same offset.
+    """
+
+    dtype = np.float32
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._path_lock = _path_lock(path)
+        self._file_lock = _FileLock(path)
+        self._file = open(path, "ab")
+        self._map = None
+
+    def append(self, array):
+        data = np.ascontiguousarray(array, dtype=self.dtype)
+        itemsize = self.dtype().itemsize
+        with self._lock, self._path_lock, self._file_lock:
+            offset = self._file.seek(0, os.SEEK_END) // itemsize
+            self._file.write(data.tobytes())
+            self._file.flush()  # the next writer's offset is the file size
+        return {"offset": offset, "shape": list(data.shape)}
+
+    def flush(self, durable=True):
+        with self._lock:
+            self._file.flush()
+            if durable:
+                os.fsync(self._file.fileno())
+
+    def read(self, ref):
+        offset = int(ref["offset"])
+        shape = tuple(ref["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        with self._lock:
+            if self._map is None or len(self._map) < offset + count:
+                length = os.path.getsize(self.path) // self.dtype().itemsize
+                if length == 0:
+                    raise ValueError(f"{self.path} is empty")
+                self._map = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(length,))
+            mapped = self._map
+        if offset + count > len(mapped):
+            raise ValueError(f"Vector ref {ref} is past the end of {self.path}")
+        return mapped[offset:offset + count].reshape(shape)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+                self._file_lock.close()
+            self._map = None